@@ -0,0 +1,321 @@
+import base64
+from datetime import datetime
+import gzip
+import hashlib
+import json
+
+from flask import (Blueprint, Response, abort, current_app, request,
+                   stream_with_context)
+from sqlalchemy import tuple_
+from werkzeug.exceptions import HTTPException
+
+from models import db, Venue, Artist, Show
+from enums import State
+from exporter import FORMATS, export_chunks
+from importer import READERS, detect_format, import_stream, text_stream
+from bookings import find_conflicts
+from constants import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
+from search import search_entities
+from utils import delete_entities
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_FIELDS = {
+    name: getattr(Venue, name) for name in (
+        'id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+        'image_link', 'website_link', 'facebook_link', 'seeking_talent',
+        'seeking_description', 'upcoming_shows_count', 'past_shows_count')
+}
+ARTIST_FIELDS = {
+    name: getattr(Artist, name) for name in (
+        'id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+        'website_link', 'facebook_link', 'seeking_venue',
+        'seeking_description', 'upcoming_shows_count', 'past_shows_count')
+}
+SHOW_FIELDS = {
+    'id': Show.id,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+    'start_time': Show.start_time,
+    'duration_minutes': Show.duration_minutes,
+}
+DEFAULT_FIELDS = ('id', 'name', 'city', 'state')
+DEFAULT_SHOW_FIELDS = ('id', 'venue_id', 'artist_id', 'start_time')
+
+COMPRESS_MIN_SIZE = 1024
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=lambda value: value.isoformat(),
+                      separators=(',', ':')).encode()
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(dumps(key)).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parse):
+    try:
+        return parse(json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4))))
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor.')
+
+
+def parse_id_key(key):
+    if not isinstance(key, int):
+        raise TypeError(key)
+    return key
+
+
+def parse_show_key(key):
+    start_time, show_id = key
+    return datetime.fromisoformat(start_time), parse_id_key(show_id)
+
+
+def requested_fields(available, default):
+    fields = request.args.get('fields')
+    if not fields:
+        return list(default)
+    fields = [field for field in fields.split(',') if field]
+    unknown = set(fields) - available.keys()
+    if unknown:
+        abort(400, f'Unknown fields: {", ".join(sorted(unknown))}.')
+    return fields
+
+
+def requested_limit():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'],
+                             type=int)
+    return min(max(limit, 1), current_app.config['API_MAX_PAGE_SIZE'])
+
+
+def api_response(data, status=200):
+    body = dumps(data)
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    response = Response(status=status, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    if status == 200 and request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        return response
+
+    encodings = request.accept_encodings
+    if len(body) >= COMPRESS_MIN_SIZE:
+        if brotli is not None and encodings['br']:
+            body = brotli.compress(body, quality=5)
+            response.content_encoding = 'br'
+        elif encodings['gzip']:
+            body = gzip.compress(body, compresslevel=6)
+            response.content_encoding = 'gzip'
+    response.set_data(body)
+    return response
+
+
+def list_entities(model, available):
+    # Keyset pagination on the primary key; the id is always selected so
+    # the next cursor can be built, and dropped again if not requested.
+    fields = requested_fields(available, DEFAULT_FIELDS)
+    limit = requested_limit()
+    columns = [available[field] for field in fields]
+    query = db.session.query(model.id, *columns).order_by(model.id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(model.id > decode_cursor(cursor, parse_id_key))
+
+    rows = query.limit(limit + 1).all()
+    page, more = rows[:limit], len(rows) > limit
+    return api_response({
+        'data': [dict(zip(fields, row[1:])) for row in page],
+        'next_cursor': encode_cursor(page[-1][0]) if more else None,
+    })
+
+
+def get_entity(model, available, entity_id):
+    fields = requested_fields(available, available.keys())
+    row = db.session.query(
+        *[available[field] for field in fields]
+    ).filter(model.id == entity_id).one_or_none()
+    if row is None:
+        abort(404)
+    return api_response({'data': dict(zip(fields, row))})
+
+
+@api.route('/venues')
+def list_venues():
+    return list_entities(Venue, VENUE_FIELDS)
+
+
+@api.route('/venues/<int:venue_id>')
+def get_venue(venue_id):
+    return get_entity(Venue, VENUE_FIELDS, venue_id)
+
+
+@api.route('/venues/<int:venue_id>/conflicts')
+def venue_conflicts(venue_id):
+    # ?start=ISO datetime&duration=minutes[&exclude=show id]: the shows
+    # that a show booked at that time would overlap.
+    start = date_arg('start')
+    if start is None:
+        abort(400, 'start is required.')
+    duration = request.args.get('duration', DEFAULT_SHOW_DURATION, type=int)
+    if not 1 <= duration <= MAX_SHOW_DURATION:
+        abort(400, f'duration must be 1 to {MAX_SHOW_DURATION} minutes.')
+    if db.session.get(Venue, venue_id) is None:
+        abort(404)
+
+    conflicts = find_conflicts(venue_id, start, duration,
+                               exclude_show_id=request.args.get(
+                                   'exclude', type=int))
+    return api_response({
+        'available': not conflicts,
+        'conflicts': [{'show_id': show_id, 'start_time': show_start,
+                       'end_time': show_end}
+                      for show_id, show_start, show_end in conflicts],
+    })
+
+
+@api.route('/artists')
+def list_artists():
+    return list_entities(Artist, ARTIST_FIELDS)
+
+
+@api.route('/artists/<int:artist_id>')
+def get_artist(artist_id):
+    return get_entity(Artist, ARTIST_FIELDS, artist_id)
+
+
+@api.route('/<any(venues, artists):kind>', methods=['DELETE'])
+def bulk_delete(kind):
+    # {"ids": [...]}; all of them are deleted in one statement, with their
+    # shows, and ids that do not exist are reported back.
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not all(
+            isinstance(entity_id, int) for entity_id in ids):
+        abort(400, 'ids must be a list of integers.')
+    if len(ids) > current_app.config['API_MAX_BULK_DELETE']:
+        abort(400, f'At most {current_app.config["API_MAX_BULK_DELETE"]} '
+                   f'ids per request.')
+
+    deleted = {entity_id for entity_id, _ in delete_entities(
+        Venue if kind == 'venues' else Artist, ids)}
+    db.session.commit()
+    return api_response({
+        'deleted': sorted(deleted),
+        'missing': sorted(set(ids) - deleted),
+    })
+
+
+@api.route('/shows')
+def list_shows():
+    fields = requested_fields(SHOW_FIELDS, DEFAULT_SHOW_FIELDS)
+    limit = requested_limit()
+    query = db.session.query(
+        Show.start_time, Show.id, *[SHOW_FIELDS[field] for field in fields]
+    ).select_from(Show)
+    if {'artist_name', 'artist_image_link'} & set(fields):
+        query = query.join(Artist, Show.artist_id == Artist.id)
+    if {'venue_name', 'venue_image_link'} & set(fields):
+        query = query.join(Venue, Show.venue_id == Venue.id)
+
+    for name, column in (('venue_id', Show.venue_id),
+                         ('artist_id', Show.artist_id)):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            query = query.filter(column == value)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(tuple_(Show.start_time, Show.id) > decode_cursor(
+            cursor, parse_show_key))
+
+    rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+    page, more = rows[:limit], len(rows) > limit
+    return api_response({
+        'data': [dict(zip(fields, row[2:])) for row in page],
+        'next_cursor': encode_cursor(
+            [page[-1][0].isoformat(), page[-1][1]]) if more else None,
+    })
+
+
+@api.route('/search')
+def search():
+    kind = request.args.get('type', 'venues')
+    if kind not in ('venues', 'artists'):
+        abort(400, 'type must be venues or artists.')
+    model = Venue if kind == 'venues' else Artist
+    page = max(request.args.get('page', 1, type=int), 1)
+    return api_response(search_entities(
+        model, request.args.get('q', ''), page=page,
+        limit=requested_limit()))
+
+
+@api.route('/import/<any(venues, artists, shows):kind>', methods=['POST'])
+def import_upload(kind):
+    # Accepts a multipart upload in the "file" field or the raw body.
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename
+    else:
+        stream, filename = request.stream, None
+    fmt = request.args.get('format') or detect_format(
+        filename, request.mimetype)
+    if fmt not in READERS:
+        abort(400, f'format must be one of {", ".join(READERS)}.')
+    report = import_stream(kind, text_stream(stream), fmt)
+    return api_response(report.as_dict(),
+                        status=500 if report.failed else 200)
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f'{name} must be an ISO date.')
+
+
+@api.route('/export/<any(venues, artists, shows):kind>')
+def export(kind):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        abort(400, f'format must be one of {", ".join(FORMATS)}.')
+    state = request.args.get('state') or None
+    if state is not None and state not in State.__members__:
+        abort(400, 'Unknown state.')
+    try:
+        chunks = export_chunks(kind, fmt, since=date_arg('since'),
+                               until=date_arg('until'), state=state)
+    except RuntimeError as error:
+        abort(501, str(error))
+
+    mimetype, extension = FORMATS[fmt]
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={kind}.{extension}')
+    return response
+
+
+@api.errorhandler(HTTPException)
+def api_error(error):
+    return api_response({'error': error.description}, status=error.code)
@@ -6,8 +6,11 @@ import collections
 import collections.abc
 
 collections.Callable = collections.abc.Callable
+from functools import lru_cache
+
 import dateutil.parser
 import babel
+import babel.dates
 from flask import (
     Flask,
     render_template,
@@ -17,12 +20,16 @@ from flask import (
     redirect,
     url_for,
     abort,
+    g,
     jsonify,
-    make_response
+    make_response,
+    stream_with_context
 )
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import noload
 from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
@@ -30,6 +37,17 @@ from flask_wtf import Form
 from models import *
 from forms import *
 from utils import *
+from search import search_entities
+from facets import facet_context, facet_filters, parse_facets
+from cache import cache, cached_page, conditional_page
+from instrumentation import instrumentation, pool_status
+from assets import assets
+from async_db import async_db
+from autocomplete import MODELS as AUTOCOMPLETE_KINDS, autocomplete
+from bookings import EXCLUSION_VIOLATION, available_venues, find_conflicts
+from commands import fyyur_cli
+from api import api
+from routing import read_only
 from constants import STRFTIME_FORMAT
 
 # ----------------------------------------------------------------------------#
@@ -40,7 +58,19 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 db.init_app(app)
+cache.init_app(app)
+async_db.init_app(app)
+assets.init_app(app)
+autocomplete.init_app(app)
+instrumentation.init_app(app)
+instrumentation.metrics.collectors.append(
+    lambda: [(f'fyyur_cache_{name}_total', (), value)
+             for name, value in cache.stats().items()])
+instrumentation.metrics.collectors.append(
+    lambda: pool_status(db.engine.pool, app.config['DB_MAX_OVERFLOW']))
 migrate = Migrate(app, db, compare_type=True)
+app.cli.add_command(fyyur_cli)
+app.register_blueprint(api)
 
 # Thank you for thorough review and good tips!
 
@@ -54,16 +84,33 @@ date_formats = {
 }
 
 
+date_locale = babel.Locale.parse('en')
+
+
+@lru_cache(maxsize=None)
+def get_date_pattern(format):
+    return babel.dates.parse_pattern(date_formats[format])
+
+
+@lru_cache(maxsize=4096)
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    computed_format = date_formats[format]
-    return babel.dates.format_datetime(date, format=computed_format,
-                                       locale='en')
+    # Payloads carry datetime objects; strings are still accepted for
+    # values that come from elsewhere.
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return get_date_pattern(format).apply(value, date_locale)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
 
 
+def stream_template(template_name, **context):
+    # Flask < 2.2 has no stream_template; render the same way it does.
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
@@ -77,71 +124,67 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@cached_page('venues')
 def venues():
-    places = Venue.query.distinct(Venue.city, Venue.state).order_by(
-        Venue.state
-    ).all()
-
-    areas = []
-
-    for place in places:
-        venues_query = Venue.query.filter_by(
-            state=place.state,
-            city=place.city
-        ).order_by(
-            Venue.name
-        ).all()
-
-        areas.append({
-            'city': place.city,
-            'state': place.state,
-            'venues': [{
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': len([show for show in venue.shows if
-                                           show.start_time > datetime.now()])
-            } for venue in venues_query if
-                venue.city == place.city and venue.state == place.state]
-        })
-
-    return render_template('pages/venues.html', areas=areas)
+    facets = parse_facets(request.args)
+    areas = get_venue_areas_payload(facet_filters(Venue, facets))
+    return render_template('pages/venues.html', areas=areas,
+                           **facet_context(Venue, facets))
 
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
     search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    facets = parse_facets(request.form)
 
-    venues_query = Venue.query.filter(
-        Venue.name.ilike(f'%{search_term}%')
-    ).all()
+    results = search_entities(Venue, search_term, page=page,
+                              filters=facet_filters(Venue, facets))
 
-    formatted_venues = []
+    return render_template('pages/search_venues.html', results=results,
+                           search_term=search_term,
+                           **facet_context(Venue, facets, search_term))
 
-    for venue in venues_query:
-        formatted_venues.append({
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": len([show for show in venue.shows if
-                                       show.start_time > datetime.now()])
-        })
 
-    results = {
-        "count": len(formatted_venues),
-        "data": formatted_venues
-    }
-    return render_template('pages/search_venues.html', results=results,
-                           search_term=search_term)
+@app.route('/venues/available')
+def available_venues_search():
+    form = AvailabilityForm(request.args)
+    results = None
+
+    if request.args and form.validate():
+        page = max(request.args.get('page', 1, type=int), 1)
+        results = available_venues(form.state.data, form.city.data.strip(),
+                                   form.start.data, form.end.data, page=page)
+
+    return render_template('pages/available_venues.html', form=form,
+                           results=results)
 
 
 @app.route('/venues/<int:venue_id>')
+@conditional_page(get_venue_page_version)
 def show_venue(venue_id):
-    venue = Venue.query.filter(Venue.id == venue_id).one_or_none()
+    def build_payload():
+        payload = get_venue_page_payload(venue_id)
+
+        if payload is None:
+            abort(404)
+
+        return payload
 
-    if venue is None:
-        abort(404)
+    payload = cache.remember(f'venue-page:{venue_id}:{g.page_version}',
+                             build_payload, tags=get_venue_page_tags)
 
-    return render_template('pages/show_venue.html',
-                           venue=get_venue_page_payload(venue=venue))
+    return render_template('pages/show_venue.html', venue=payload)
+
+
+@app.route('/venues/<int:venue_id>/shows/<any(upcoming, past):when>')
+def venue_shows_page(venue_id, when):
+    page = max(request.args.get('page', 1, type=int), 1)
+    shows = get_shows_page(Show.venue_id, venue_id,
+                           upcoming=when == 'upcoming', page=page)
+
+    return render_template('pages/venue_show_tiles.html', shows=shows)
 
 
 #  Create Venue
@@ -195,11 +238,10 @@ def delete_venue(venue_id):
     context = {}
 
     try:
-        venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
-        if venue is None:
+        deleted = delete_entities(Venue, [venue_id])
+        if not deleted:
             raise ValueError('Venue with this id does not exist.')
-        context['name'] = venue.name
-        db.session.delete(venue)
+        context['name'] = deleted[0][1]
         db.session.commit()
     except:
         error = True
@@ -219,53 +261,63 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@cached_page('artists')
 def artists():
-    artists_query = db.session.query(Artist.id, Artist.name).all()
-    return render_template('pages/artists.html', artists=artists_query)
+    facets = parse_facets(request.args)
+    artists_query = db.session.query(Artist.id, Artist.name).filter(
+        *facet_filters(Artist, facets)).all()
+    return render_template('pages/artists.html', artists=artists_query,
+                           **facet_context(Artist, facets))
 
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
     search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    facets = parse_facets(request.form)
 
-    artists_query = Artist.query.filter(
-        Artist.name.ilike(f'%{search_term}%')
-    ).all()
-
-    formatted_artists = []
-
-    for artist in artists_query:
-        formatted_artists.append({
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": len([show for show in artist.shows if
-                                       show.start_time > datetime.now()])
-        })
-    results = {
-        "count": len(formatted_artists),
-        "data": formatted_artists
-    }
+    results = search_entities(Artist, search_term, page=page,
+                              filters=facet_filters(Artist, facets))
 
     return render_template('pages/search_artists.html', results=results,
-                           search_term=search_term)
+                           search_term=search_term,
+                           **facet_context(Artist, facets, search_term))
 
 
 @app.route('/artists/<int:artist_id>')
+@conditional_page(get_artist_page_version)
 def show_artist(artist_id):
-    artist = Artist.query.filter(Artist.id == artist_id).one_or_none()
+    def build_payload():
+        payload = get_artist_page_payload(artist_id)
 
-    if artist is None:
-        abort(404)
+        if payload is None:
+            abort(404)
 
-    return render_template('pages/show_artist.html',
-                           artist=get_artist_page_payload(artist=artist))
+        return payload
+
+    payload = cache.remember(f'artist-page:{artist_id}:{g.page_version}',
+                             build_payload, tags=get_artist_page_tags)
+
+    return render_template('pages/show_artist.html', artist=payload)
+
+
+@app.route('/artists/<int:artist_id>/shows/<any(upcoming, past):when>')
+def artist_shows_page(artist_id, when):
+    page = max(request.args.get('page', 1, type=int), 1)
+    shows = get_shows_page(Show.artist_id, artist_id,
+                           upcoming=when == 'upcoming', page=page)
+
+    return render_template('pages/artist_show_tiles.html', shows=shows)
 
 
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
+    artist = Artist.query.options(
+        noload(Artist.shows)
+    ).get_or_404(artist_id)
 
     form = ArtistForm(obj=artist)
 
@@ -281,7 +333,9 @@ def edit_artist_submission(artist_id):
     form = ArtistForm(request.form)
 
     try:
-        artist = Artist.query.get(artist_id)
+        artist = Artist.query.options(
+            noload(Artist.shows)
+        ).get(artist_id)
         if artist is None:
             abort(404)
 
@@ -318,7 +372,9 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
+    venue = Venue.query.options(
+        noload(Venue.shows)
+    ).get_or_404(venue_id)
 
     form = VenueForm(obj=venue)
 
@@ -333,7 +389,9 @@ def edit_venue_submission(venue_id):
     context = {}
     form = VenueForm(request.form)
     try:
-        venue = Venue.query.get(venue_id)
+        venue = Venue.query.options(
+            noload(Venue.shows)
+        ).get(venue_id)
         if venue is None:
             abort(404)
 
@@ -368,6 +426,31 @@ def edit_venue_submission(venue_id):
             return redirect(url_for('show_venue', venue_id=venue_id))
 
 
+@app.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    error = False
+    context = {}
+
+    try:
+        deleted = delete_entities(Artist, [artist_id])
+        if not deleted:
+            raise ValueError('Artist with this id does not exist.')
+        context['name'] = deleted[0][1]
+        db.session.commit()
+    except:
+        error = True
+        db.session.rollback()
+    finally:
+        db.session.close()
+
+        if error:
+            flash('An error occurred. Artist could not be deleted.')
+            return make_response(jsonify({'success': False}), 404)
+        else:
+            flash('Artist ' + context['name'] + ' was successfully deleted!')
+            return jsonify({'success': True})
+
+
 #  Create Artist
 #  ----------------------------------------------------------------
 
@@ -417,12 +500,20 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@cached_page('shows', 'venues', 'artists')
 def shows():
-    shows_query = Show.query.all()
+    limit = request.args.get('limit', app.config['SHOWS_PER_PAGE'], type=int)
+    limit = min(max(limit, 1), app.config['SHOWS_MAX_PER_PAGE'])
+    after = request.args.get('after')
 
-    formatted_shows = map(lambda item: item.format(), shows_query)
+    try:
+        after = decode_show_cursor(after) if after else None
+    except ValueError:
+        abort(400)
 
-    return render_template('pages/shows.html', shows=formatted_shows)
+    return stream_template('pages/shows.html',
+                           shows=ShowsPage(after=after, limit=limit),
+                           limit=limit)
 
 @app.route('/shows/create')
 def create_shows():
@@ -444,8 +535,26 @@ def create_show_submission():
             raise ValueError('Form values are incorrect')
         newShow = Show()
         form.populate_obj(newShow)
+        for show_id, start, end in find_conflicts(
+                int(newShow.venue_id), newShow.start_time,
+                newShow.duration_minutes):
+            errorMessages.append(
+                'venue_id: The venue is already booked from ' +
+                start.strftime(STRFTIME_FORMAT) + ' to ' +
+                end.strftime(STRFTIME_FORMAT) + ' (show ' + str(show_id) +
+                ').')
+        if len(errorMessages) > 0:
+            raise ValueError('Venue is already booked')
         db.session.add(newShow)
         db.session.commit()
+    except IntegrityError as integrityError:
+        error = True
+        db.session.rollback()
+        # Another show was booked at the venue since the check above.
+        if getattr(integrityError.orig, 'pgcode', None) == \
+                EXCLUSION_VIOLATION:
+            errorMessages.append(
+                'venue_id: The venue was just booked for this time.')
     except:
         error = True
         db.session.rollback()
@@ -463,6 +572,28 @@ def create_show_submission():
             return render_template('pages/home.html')
 
 
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@app.route('/autocomplete')
+def autocomplete_names():
+    kind = request.args.get('kind')
+    if kind is not None and kind not in AUTOCOMPLETE_KINDS:
+        abort(400)
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', app.config['AUTOCOMPLETE_LIMIT'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['AUTOCOMPLETE_MAX_LIMIT'])
+
+    return jsonify({name: autocomplete.complete(name, prefix, limit)
+                    for name in ([kind] if kind else AUTOCOMPLETE_KINDS)})
+
+
+@app.route('/__cache')
+def cache_stats():
+    return jsonify(cache.stats())
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
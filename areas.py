@@ -0,0 +1,148 @@
+from itertools import groupby
+
+from sqlalchemy import delete, event, exists, inspect, select, text, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+
+from models import db, Venue, Show, venue_areas
+
+
+def area_venues(areas=None):
+    """One row per (state, city) with its venues as a JSON array."""
+    query = select(
+        Venue.state,
+        Venue.city,
+        db.func.jsonb_agg(aggregate_order_by(
+            db.func.jsonb_build_object(
+                'id', Venue.id,
+                'name', Venue.name,
+                'num_upcoming_shows', Venue.upcoming_shows_count),
+            Venue.name, Venue.id))
+    ).group_by(Venue.state, Venue.city)
+    if areas is not None:
+        query = query.where(tuple_(Venue.state, Venue.city).in_(areas))
+    return query
+
+
+def replace_venue_areas(session, areas=None):
+    """Recompute area rows with portable SQL, building the arrays here.
+
+    Used on databases other than PostgreSQL, which have neither
+    jsonb_agg nor ON CONFLICT row locking; concurrent refreshes of one
+    area are not serialized there.
+    """
+    query = select(Venue.state, Venue.city, Venue.id, Venue.name,
+                   Venue.upcoming_shows_count).order_by(
+        Venue.state, Venue.city, Venue.name, Venue.id)
+    stale = delete(venue_areas)
+    if areas is not None:
+        query = query.where(tuple_(Venue.state, Venue.city).in_(areas))
+        stale = stale.where(
+            tuple_(venue_areas.c.state, venue_areas.c.city).in_(areas))
+    rows = [
+        {'state': state, 'city': city, 'venues': [
+            {'id': venue.id, 'name': venue.name,
+             'num_upcoming_shows': venue.upcoming_shows_count}
+            for venue in venues]}
+        for (state, city), venues in groupby(
+            session.execute(query), lambda row: (row.state, row.city))]
+    session.execute(stale)
+    if rows:
+        session.execute(venue_areas.insert(), rows)
+
+
+def refresh_venue_areas(session, areas):
+    """Recompute the given (state, city) rows of the area directory."""
+    areas = sorted(areas)
+    if session.bind.dialect.name != 'postgresql':
+        return replace_venue_areas(session, areas)
+    columns = [venue_areas.c.state, venue_areas.c.city, venue_areas.c.venues]
+
+    # Lock the rows first, creating the missing ones, so a concurrent
+    # refresh of the same area waits for this transaction. The statements
+    # below then read a snapshot that includes what it committed.
+    placeholders = insert(venue_areas).values(
+        [{'state': state, 'city': city, 'venues': []}
+         for state, city in areas])
+    session.execute(placeholders.on_conflict_do_update(
+        index_elements=['state', 'city'],
+        set_={'venues': venue_areas.c.venues}))
+
+    upsert = insert(venue_areas).from_select(columns, area_venues(areas))
+    session.execute(upsert.on_conflict_do_update(
+        index_elements=['state', 'city'],
+        set_={'venues': upsert.excluded.venues}))
+
+    session.execute(delete(venue_areas).where(
+        tuple_(venue_areas.c.state, venue_areas.c.city).in_(areas),
+        ~exists().where(Venue.state == venue_areas.c.state,
+                        Venue.city == venue_areas.c.city)))
+
+
+def rebuild_venue_areas(session):
+    """Recompute the whole area directory from the venues table.
+
+    Readers keep seeing the previous directory until the transaction
+    commits; writers wait for it.
+    """
+    if session.bind.dialect.name != 'postgresql':
+        replace_venue_areas(session)
+    else:
+        session.execute(text('LOCK TABLE venue_areas IN EXCLUSIVE MODE'))
+        session.execute(delete(venue_areas))
+        session.execute(insert(venue_areas).from_select(
+            [venue_areas.c.state, venue_areas.c.city, venue_areas.c.venues],
+            area_venues()))
+    session.info.pop('stale_areas', None)
+    session.info.pop('stale_area_venues', None)
+
+
+def mark_areas_stale(session, areas=(), venue_ids=()):
+    """Refresh these areas, and those of these venues, before commit.
+
+    For writes that bypass the ORM, e.g. COPY or bulk UPDATE statements.
+    """
+    session.info.setdefault('stale_areas', set()).update(areas)
+    session.info.setdefault('stale_area_venues', set()).update(venue_ids)
+
+
+def areas_of(venue):
+    # The area before and after the flush, from the attribute history.
+    attrs = inspect(venue).attrs
+    areas = set()
+    for side in ('deleted', 'added'):
+        state = getattr(attrs.state.history, side) or \
+            attrs.state.history.unchanged
+        city = getattr(attrs.city.history, side) or \
+            attrs.city.history.unchanged
+        if state and city:
+            areas.add((state[0], city[0]))
+    return areas
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_stale_areas(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Venue):
+            mark_areas_stale(session, areas=areas_of(instance))
+        elif isinstance(instance, Show):
+            history = inspect(instance).attrs.venue_id.history
+            mark_areas_stale(session, venue_ids=filter(None, history.sum()))
+
+
+@event.listens_for(db.session, 'before_commit')
+def refresh_stale_areas(session):
+    session.flush()
+    areas = session.info.pop('stale_areas', set())
+    venue_ids = session.info.pop('stale_area_venues', set())
+    if venue_ids:
+        areas.update(tuple(row) for row in session.execute(
+            select(Venue.state, Venue.city).where(
+                Venue.id.in_(venue_ids)).distinct()))
+    if areas:
+        refresh_venue_areas(session, areas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_stale_areas(session):
+    session.info.pop('stale_areas', None)
+    session.info.pop('stale_area_venues', None)
@@ -0,0 +1,17 @@
+# ASGI entry point, e.g. `uvicorn asgi:application --workers 4`.
+#
+# Flask views stay synchronous and run in a thread pool of
+# ASGI_THREADS per worker; the venue and artist pages run their queries
+# concurrently on the async engine, see async_db.py. Needs the a2wsgi,
+# asyncpg and uvicorn packages.
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+app.config['ASYNC_DB_ENABLED'] = True
+
+application = WSGIMiddleware(app, workers=int(os.environ.get(
+    'ASGI_THREADS', 16)))
@@ -0,0 +1,241 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Output directory under static/, and the manifest mapping asset names to
+# fingerprinted files in it.
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Concatenated in this order. Names without a bundle are single files
+# under static/.
+BUNDLES = {
+    'main.css': ['css/bootstrap.min.css', 'css/layout.main.css',
+                 'css/main.css', 'css/main.responsive.css',
+                 'css/main.quickfix.css'],
+    'form.css': ['css/bootstrap.min.css', 'css/bootstrap-theme.min.css',
+                 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'app.js': ['js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js',
+               'js/script.js'],
+}
+
+# What each layout loads from static/, for the page weight report.
+LAYOUTS = {
+    'main.html': ['main.css', 'head.js', 'app.js'],
+    'form.html': ['form.css', 'js/libs/modernizr-2.8.2.min.js', 'app.js'],
+}
+
+SOURCE_DIRS = ('css', 'fonts', 'img', 'js')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s*([{};,>])\s*')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(text):
+    # Comments and whitespace only; /*! license comments are kept.
+    text = CSS_COMMENT.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    return CSS_SPACE.sub(r'\1', text).replace(';}', '}').strip()
+
+
+def minify(name, text):
+    if '.min.' in name:
+        return text
+    if name.endswith('.css'):
+        return minify_css(text)
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def rewrite_css_urls(text, source, target, manifest):
+    # url()s are relative to the source file; point them at the
+    # fingerprinted copy, or at the original file if it does not exist.
+    def replace(match):
+        url = match.group(2)
+        if re.match(r'^(data:|[a-z]+://|/|#)', url):
+            return match.group(0)
+        path, rest = re.match(r'([^?#]*)(.*)', url).groups()
+        resolved = os.path.normpath(
+            os.path.join(os.path.dirname(source), path)).replace(os.sep, '/')
+        resolved = manifest.get(resolved, resolved)
+        relative = os.path.relpath(
+            resolved, os.path.dirname(target)).replace(os.sep, '/')
+        return f'url({relative}{rest})'
+
+    return CSS_URL.sub(replace, text)
+
+
+def write_variants(path, data):
+    """Write a file with .gz and, if brotli is installed, .br next to it.
+
+    A variant that is not smaller, e.g. of an image, is left out.
+    """
+    with open(path, 'wb') as output:
+        output.write(data)
+    sizes = {'raw': len(data)}
+    compressors = {'gz': lambda: gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda: brotli.compress(data, quality=11)
+    for suffix, compress in compressors.items():
+        compressed = compress()
+        if len(compressed) < len(data):
+            with open(f'{path}.{suffix}', 'wb') as output:
+                output.write(compressed)
+            sizes[suffix] = len(compressed)
+    return sizes
+
+
+def build_assets(static_folder):
+    """Fingerprint static files and bundles into static/dist/.
+
+    Returns the manifest and the sizes of every file written, by asset
+    name.
+    """
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest, sizes = {}, {}
+
+    def emit(name, data):
+        target = f'{DIST}/{fingerprint(name, data)}'
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        sizes[name] = write_variants(path, data)
+        manifest[name] = target
+
+    # Single files first, so bundled CSS can point at their copies.
+    for directory in SOURCE_DIRS:
+        root = os.path.join(static_folder, directory)
+        for folder, _, files in sorted(os.walk(root)):
+            for filename in sorted(files):
+                if filename.endswith('.map'):
+                    continue
+                path = os.path.join(folder, filename)
+                name = os.path.relpath(path, static_folder).replace(
+                    os.sep, '/')
+                with open(path, 'rb') as source:
+                    emit(name, source.read())
+
+    for name, sources in BUNDLES.items():
+        target = f'{DIST}/{name}'
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source),
+                      encoding='utf-8') as stream:
+                text = minify(source, stream.read())
+            if name.endswith('.css'):
+                text = rewrite_css_urls(text, source, target, manifest)
+            parts.append(text)
+        # A newline (and ; for scripts) keeps a missing terminator in one
+        # file from running into the next.
+        separator = '\n' if name.endswith('.css') else ';\n'
+        emit(name, separator.join(parts).encode())
+
+    with open(os.path.join(dist, MANIFEST), 'w') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    return manifest, sizes
+
+
+def page_weight(static_folder, sizes):
+    """Bytes and requests per layout, before and after the build.
+
+    Before is every source file uncompressed, one request each, as they
+    used to be served; after is one request per bundle, minified and at
+    its smallest precompressed size.
+    """
+    report = {}
+    for layout, names in LAYOUTS.items():
+        sources = [source for name in names
+                   for source in BUNDLES.get(name, [name])]
+        report[layout] = {
+            'requests_before': len(sources),
+            'bytes_before': sum(
+                os.path.getsize(os.path.join(static_folder, source))
+                for source in sources),
+            'requests_after': len(names),
+            'bytes_minified': sum(sizes[name]['raw'] for name in names),
+            'bytes_after': sum(min(sizes[name].values()) for name in names),
+        }
+    return report
+
+
+class Assets:
+    """Template helpers for the built assets and the route serving them.
+
+    Without a manifest, e.g. in development, the helpers link the source
+    files of each bundle instead.
+    """
+
+    def __init__(self):
+        self.manifest = {}
+
+    def init_app(self, app):
+        path = os.path.join(app.static_folder, DIST, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as stream:
+                self.manifest = json.load(stream)
+        app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>',
+                         'dist', self.send_dist)
+        app.add_template_global(self.asset_url)
+        app.add_template_global(self.asset_urls)
+        app.extensions['assets'] = self
+
+    def asset_url(self, name):
+        return url_for('static', filename=self.manifest.get(name, name))
+
+    def asset_urls(self, name):
+        if name in self.manifest or name not in BUNDLES:
+            return [self.asset_url(name)]
+        return [url_for('static', filename=source)
+                for source in BUNDLES[name]]
+
+    def send_dist(self, filename):
+        # Fingerprinted files never change, and the precompressed
+        # variants are served to clients that accept them.
+        directory = os.path.join(current_app.static_folder, DIST)
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.exists(
+                    os.path.join(directory, filename + suffix)):
+                encoding = candidate
+                filename += suffix
+                break
+
+        response = send_from_directory(directory, filename,
+                                       mimetype=mimetype,
+                                       max_age=IMMUTABLE_MAX_AGE)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
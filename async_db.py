@@ -0,0 +1,82 @@
+import asyncio
+import os
+import threading
+
+from sqlalchemy.engine import make_url
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+class AsyncDatabase:
+    """Runs independent read statements concurrently on an asyncio engine.
+
+    Views stay synchronous. Each process starts one event loop in a
+    daemon thread, and every worker thread submits its statements to
+    that loop, so all of them share one asyncpg connection pool. A view
+    waits for the slowest of its statements instead of their sum.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        self.loop = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['async_db'] = self
+
+    @property
+    def enabled(self):
+        return self.app is not None and self.app.config['ASYNC_DB_ENABLED']
+
+    def start(self):
+        # The loop thread does not survive a fork, so each gunicorn or
+        # uvicorn worker starts its own on first use.
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            config = self.app.config
+            url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+            url = url.set(drivername=ASYNC_DRIVERS.get(
+                url.get_backend_name(), url.drivername))
+            options = dict(config['SQLALCHEMY_ENGINE_OPTIONS'])
+            if config['DB_PGBOUNCER'] and url.get_backend_name() == \
+                    'postgresql':
+                # Prepared statements do not survive PgBouncer's
+                # transaction pooling.
+                options['connect_args'] = {'statement_cache_size': 0,
+                                           'prepared_statement_cache_size': 0}
+
+            self.engine = create_async_engine(url, **options)
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True,
+                             name='async-db').start()
+            self.pid = os.getpid()
+
+    async def fetch(self, statement):
+        async with self.engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+    async def fetch_all(self, statements):
+        results = await asyncio.gather(
+            *[self.fetch(statement) for statement in statements.values()])
+        return dict(zip(statements, results))
+
+    def run_all(self, statements):
+        """Run a dict of statements at once and return their rows by key."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.fetch_all(statements), self.loop).result()
+
+
+async_db = AsyncDatabase()
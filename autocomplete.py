@@ -0,0 +1,239 @@
+import threading
+import time
+from array import array
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+
+from models import db, Venue, Artist
+
+MODELS = {'venues': Venue, 'artists': Artist}
+KINDS = {model: kind for kind, model in MODELS.items()}
+
+
+def name_key(name):
+    # Case and runs of whitespace do not matter when completing.
+    return ' '.join(name.casefold().split())
+
+
+class NameIndex:
+    """Names sorted case-insensitively, with their ids in a parallel array.
+
+    Only the names are kept: a completion computes the keys of the
+    O(log n) names the binary search compares against and of the matches
+    it returns, so no second, lowercased copy of every name is held.
+    """
+
+    def __init__(self, rows=()):
+        rows = sorted(rows, key=lambda row: name_key(row[1]))
+        self.ids = array('q', [entity_id for entity_id, _ in rows])
+        self.names = [name for _, name in rows]
+
+    def __len__(self):
+        return len(self.names)
+
+    def position(self, key):
+        low, high = 0, len(self.names)
+        while low < high:
+            middle = (low + high) // 2
+            if name_key(self.names[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, entity_id, name):
+        # Search the run of equal keys first; scan the ids only when the
+        # name is unknown or out of date.
+        if name is not None:
+            key = name_key(name)
+            position = self.position(key)
+            while position < len(self.names) and \
+                    name_key(self.names[position]) == key:
+                if self.ids[position] == entity_id:
+                    return position
+                position += 1
+        try:
+            return self.ids.index(entity_id)
+        except ValueError:
+            return None
+
+    def update(self, entity_id, old_name, new_name):
+        """Move an entry from old_name to new_name; either may be None."""
+        position = self.find(entity_id, old_name)
+        if position is not None:
+            del self.names[position], self.ids[position]
+        if new_name is not None:
+            position = self.position(name_key(new_name))
+            self.names.insert(position, new_name)
+            self.ids.insert(position, entity_id)
+
+    def complete(self, prefix, limit):
+        key = name_key(prefix)
+        if not key:
+            return []
+        found = []
+        start = self.position(key)
+        for position in range(start, min(start + limit, len(self.names))):
+            if not name_key(self.names[position]).startswith(key):
+                break
+            found.append({'id': self.ids[position],
+                          'name': self.names[position]})
+        return found
+
+
+class Autocomplete:
+    """Per-process name indexes of venues and artists.
+
+    An index is loaded on its first completion and kept current from
+    committed ORM changes. Writes made by other processes are picked up
+    by rebuilding it in the background once it is older than
+    AUTOCOMPLETE_MAX_AGE, while the old one keeps answering. A table with
+    more than AUTOCOMPLETE_MAX_NAMES rows is not held in memory; its
+    completions are answered by the database instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        # kind -> (NameIndex, or None when too large, monotonic load time)
+        self.indexes = {}
+        # Changes committed while a kind is being reloaded, replayed on
+        # the new index.
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.loading = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['autocomplete'] = self
+
+    def load(self, kind):
+        model = MODELS[kind]
+        count = db.session.query(func.count(model.id)).scalar()
+        if count > current_app.config['AUTOCOMPLETE_MAX_NAMES']:
+            return None
+        return NameIndex(db.session.execute(select(model.id, model.name)))
+
+    def reload(self, kind):
+        with self.lock:
+            self.pending.setdefault(kind, [])
+        try:
+            index = self.load(kind)
+        except Exception:
+            with self.lock:
+                self.pending.pop(kind, None)
+            raise
+        with self.lock:
+            for change in self.pending.pop(kind, ()):
+                if index is not None:
+                    index.update(*change)
+            self.indexes[kind] = (index, time.monotonic())
+        return index
+
+    def reload_in_background(self, kind):
+        def run():
+            with self.app.app_context():
+                try:
+                    self.reload(kind)
+                except Exception:
+                    self.app.logger.exception('Reloading %s names failed',
+                                              kind)
+                    with self.lock:
+                        index, _ = self.indexes[kind]
+                        self.indexes[kind] = (index, time.monotonic())
+                finally:
+                    db.session.remove()
+
+        threading.Thread(target=run, daemon=True,
+                         name=f'autocomplete-{kind}').start()
+
+    def index(self, kind):
+        max_age = current_app.config['AUTOCOMPLETE_MAX_AGE']
+        with self.lock:
+            entry = self.indexes.get(kind)
+            if entry is not None and kind not in self.pending and \
+                    time.monotonic() - entry[1] > max_age:
+                # Reload once; until then the current index answers.
+                self.pending[kind] = []
+                self.reload_in_background(kind)
+        if entry is not None:
+            return entry[0]
+
+        with self.loading:
+            entry = self.indexes.get(kind)
+            return entry[0] if entry is not None else self.reload(kind)
+
+    def complete(self, kind, prefix, limit):
+        index = self.index(kind)
+        if index is None:
+            return self.query(kind, prefix, limit)
+        with self.lock:
+            return index.complete(prefix, limit)
+
+    def query(self, kind, prefix, limit):
+        if not name_key(prefix):
+            return []
+        model = MODELS[kind]
+        pattern = prefix.strip().replace('\\', '\\\\').replace(
+            '%', '\\%').replace('_', '\\_') + '%'
+        rows = db.session.query(model.id, model.name).filter(
+            model.name.ilike(pattern, escape='\\')
+        ).order_by(func.lower(model.name), model.id).limit(limit)
+        return [row._asdict() for row in rows]
+
+    def apply(self, changes, stale):
+        with self.lock:
+            for kind, *change in changes:
+                if kind in self.pending:
+                    self.pending[kind].append(change)
+                index, _ = self.indexes.get(kind, (None, None))
+                if index is not None:
+                    index.update(*change)
+            for kind in stale:
+                if kind in self.indexes:
+                    # Rebuilt in the background on the next completion.
+                    index, _ = self.indexes[kind]
+                    self.indexes[kind] = (index, float('-inf'))
+
+
+autocomplete = Autocomplete()
+
+
+def mark_names_changed(session, kind, changes=(), stale=False):
+    """Apply these (id, old name, new name) changes after commit.
+
+    For writes that bypass the ORM, e.g. COPY or bulk DELETE statements.
+    A None old name adds an entry and a None new name removes one; stale
+    rebuilds the whole index when the ids are not known.
+    """
+    session.info.setdefault('name_changes', []).extend(
+        (kind, *change) for change in changes)
+    if stale:
+        session.info.setdefault('stale_names', set()).add(kind)
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_name_changes(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        kind = KINDS.get(type(instance))
+        if kind is None:
+            continue
+        history = inspect(instance).attrs.name.history
+        old_name = next(iter(history.deleted or history.unchanged), None)
+        if instance in session.deleted:
+            mark_names_changed(session, kind, [(instance.id, old_name, None)])
+        elif instance in session.new or history.has_changes():
+            mark_names_changed(session, kind,
+                               [(instance.id, old_name, instance.name)])
+
+
+@event.listens_for(db.session, 'after_commit')
+def update_name_indexes(session):
+    autocomplete.apply(session.info.pop('name_changes', ()),
+                       session.info.pop('stale_names', ()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_name_changes(session):
+    session.info.pop('name_changes', None)
+    session.info.pop('stale_names', None)
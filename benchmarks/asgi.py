@@ -0,0 +1,129 @@
+# Compares requests/sec of the WSGI deployment (gunicorn, sync views and
+# queries) with the ASGI one (uvicorn, concurrent detail page queries) at
+# the same worker count, on the venue and artist detail pages. Both
+# servers are started from this checkout with the page cache disabled.
+# Seed the database first, e.g. `flask fyyur seed`.
+#
+#   python -m benchmarks.asgi [--workers 4] [--server-threads 16]
+#                             [--threads 32] [--seconds 10]
+
+import argparse
+import http.client
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+SERVERS = {
+    'wsgi': lambda port, workers, threads: [
+        'gunicorn', '--workers', str(workers), '--threads', str(threads),
+        '--bind', f'127.0.0.1:{port}', 'app:app'],
+    'asgi': lambda port, workers, threads: [
+        'uvicorn', '--workers', str(workers), '--port', str(port),
+        '--log-level', 'warning', 'asgi:application'],
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=32,
+                        help='concurrent client connections')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--server-threads', type=int, default=16,
+                        help='request threads per worker, for both servers')
+    parser.add_argument('--port', type=int, default=8765)
+    return parser.parse_args()
+
+
+def detail_paths():
+    from app import app
+    from models import db, Venue, Artist
+
+    with app.app_context():
+        venue_ids = [row.id for row in db.session.query(Venue.id).limit(50)]
+        artist_ids = [row.id for row in db.session.query(Artist.id).limit(50)]
+    return ([f'/venues/{venue_id}' for venue_id in venue_ids]
+            + [f'/artists/{artist_id}' for artist_id in artist_ids])
+
+
+def wait_until_up(port, process):
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def hammer(port, paths, threads, seconds):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        done = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            connection.request('GET', paths[done % len(paths)])
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status)
+            done += 1
+
+    workers = [threading.Thread(target=client, args=(offset,))
+               for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, errors
+
+
+def main():
+    args = parse_args()
+    paths = detail_paths()
+    env = dict(os.environ, CACHE_BACKEND='null',
+               ASGI_THREADS=str(args.server_threads))
+
+    print(f'{args.workers} workers, {args.threads} connections, '
+          f'{args.seconds:g}s')
+    print(f'{"server":<6} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+          f'{"errors":>7}')
+    for name, command in SERVERS.items():
+        command = command(args.port, args.workers, args.server_threads)
+        if shutil.which(command[0]) is None:
+            print(f'{name:<6} skipped, {command[0]} is not installed')
+            continue
+        process = subprocess.Popen(command, env=env,
+                                   stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(args.port, process)
+            hammer(args.port, paths, args.threads, 1)
+            latencies, errors = hammer(args.port, paths, args.threads,
+                                       args.seconds)
+        finally:
+            process.terminate()
+            process.wait()
+
+        ordered = sorted(latencies) or [0]
+        p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        print(f'{name:<6} {len(latencies) / args.seconds:>9.1f} '
+              f'{statistics.median(ordered):>9.2f} {p95:>9.2f} '
+              f'{len(errors):>7}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
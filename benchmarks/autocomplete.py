@@ -0,0 +1,71 @@
+# Measures the memory and latency of the in-memory autocomplete index on
+# synthetic names shaped like the seeded ones. No database is needed.
+#
+#   python -m benchmarks.autocomplete [names] [lookups]
+
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from autocomplete import NameIndex
+from seed import ARTIST_SUFFIXES, VENUE_SUFFIXES, pick_name
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def timed(call, arguments):
+    latencies = []
+    for argument in arguments:
+        started = time.perf_counter()
+        call(*argument)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    ordered = sorted(latencies)
+    return (statistics.median(ordered), percentile(ordered, 0.99),
+            ordered[-1])
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rng = random.Random(0)
+    suffixes = VENUE_SUFFIXES + ARTIST_SUFFIXES
+    names = [pick_name(rng, suffixes, number)
+             for number in range(1, count + 1)]
+
+    started = time.perf_counter()
+    index = NameIndex(enumerate(names, 1))
+    built = time.perf_counter() - started
+
+    # The names are allocated above; this is the index's own memory on
+    # top of them.
+    del index
+    tracemalloc.start()
+    index = NameIndex(enumerate(names, 1))
+    overhead = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    names_size = sum(sys.getsizeof(name) for name in names)
+
+    print(f'{count} names, built in {built:.2f}s')
+    print(f'memory: {names_size / 2**20:.1f} MiB of names, '
+          f'{overhead / 2**20:.1f} MiB of index')
+    print(f'{"operation":<22} {"p50 us":>9} {"p99 us":>9} {"max us":>9}')
+
+    samples = [rng.choice(names) for _ in range(lookups)]
+    for length in (1, 3, 8, 16):
+        prefixes = [(sample[:length], 10) for sample in samples]
+        p50, p99, worst = timed(index.complete, prefixes)
+        print(f'{f"complete {length} chars":<22} {p50:>9.1f} {p99:>9.1f} '
+              f'{worst:>9.1f}')
+
+    renames = []
+    for _ in range(min(lookups, 1000)):
+        entity_id = rng.randint(1, count)
+        new_name = pick_name(rng, suffixes, entity_id)
+        renames.append((entity_id, names[entity_id - 1], new_name))
+        names[entity_id - 1] = new_name
+    p50, p99, worst = timed(index.update, renames)
+    print(f'{"rename":<22} {p50:>9.1f} {p99:>9.1f} {worst:>9.1f}')
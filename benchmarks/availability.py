@@ -0,0 +1,78 @@
+# Compares the venue availability search, one anti-join against the
+# shows' period index, with loading each venue's shows and checking them
+# in Python. Seed a database at the intended scale first:
+#
+#   flask fyyur seed --venues 100000 --artists 200000 --shows 10000000
+#   python -m benchmarks.availability [iterations]
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+from app import app
+from bookings import available_venues, show_end
+from models import db, Venue
+
+
+def legacy_available_venues(state, city, start, end):
+    venues = Venue.query.filter_by(state=state, city=city).order_by(
+        Venue.name, Venue.id).all()
+    return [venue for venue in venues if not any(
+        show.start_time < end and
+        show_end(show.start_time, show.duration_minutes) > start
+        for show in venue.shows)]
+
+
+def busiest_areas(count):
+    return db.session.query(Venue.state, Venue.city).group_by(
+        Venue.state, Venue.city
+    ).order_by(func.count().desc()).limit(count).all()
+
+
+def windows(now):
+    night = (now + timedelta(days=7)).replace(hour=18, minute=0, second=0,
+                                              microsecond=0)
+    return {
+        'one night': (night, night + timedelta(hours=6)),
+        'one week': (night, night + timedelta(days=7)),
+    }
+
+
+def measure(search, iterations):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            found = search()
+            db.session.remove()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+    return elapsed / iterations * 1000, len(statements) / iterations, found
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with app.app_context():
+        areas = busiest_areas(3)
+        for label, (start, end) in windows(datetime.now()).items():
+            for state, city in areas:
+                print(f'{city}, {state}, {label}:')
+                for name, search in (
+                        ('legacy', lambda: len(legacy_available_venues(
+                            state, city, start, end))),
+                        ('anti-join', lambda: available_venues(
+                            state, city, start, end)['count'])):
+                    latency, queries, found = measure(search, iterations)
+                    print(f'{name:>10}: {latency:10.2f} ms/request '
+                          f'{queries:8.1f} queries/request '
+                          f'{found:6} free venues')
@@ -0,0 +1,49 @@
+# Micro-benchmark of the `datetime` Jinja filter on a shows page worth of
+# timestamps, against the previous strftime -> dateutil -> babel path.
+#
+#   python -m benchmarks.datetime_filter [shows] [repeats]
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, date_formats
+from constants import STRFTIME_FORMAT
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, format=date_formats[format],
+                                       locale='en')
+
+
+def measure(render, values, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for value in values:
+            render(value, 'full')
+    return (time.perf_counter() - started) / (repeats * len(values)) * 1e6
+
+
+if __name__ == '__main__':
+    shows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    # Shows cluster on a limited set of evenings, as on the real listing.
+    start = datetime(2026, 1, 1, 20, 0)
+    timestamps = [start + timedelta(days=n % 365, minutes=30 * (n % 4))
+                  for n in range(shows)]
+
+    legacy = measure(legacy_format_datetime,
+                     [value.strftime(STRFTIME_FORMAT) for value in timestamps],
+                     repeats)
+    format_datetime.cache_clear()
+    cold = measure(format_datetime, timestamps, 1)
+    warm = measure(format_datetime, timestamps, repeats)
+
+    print(f'legacy: {legacy:8.2f} us/call')
+    print(f'  cold: {cold:8.2f} us/call (first render, memo empty)')
+    print(f'  warm: {warm:8.2f} us/call')
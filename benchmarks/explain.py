@@ -0,0 +1,85 @@
+# Checks that the hot queries issued by app.py are planned as index scans.
+# Run from the repository root against a seeded PostgreSQL database; the
+# script exits with a non-zero status when a query does not use its index.
+#
+#   python -m benchmarks.explain
+
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import app
+from bookings import SHOW_PERIOD
+from facets import facet_filters
+from models import db, Venue, Artist, Show
+
+SCAN_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+
+def index_scans(plan):
+    found = set()
+    if plan.get('Node Type') in SCAN_NODES:
+        found.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        found |= index_scans(child)
+    return found
+
+
+def explain(query):
+    compiled = query.statement.compile(db.engine)
+    with db.engine.connect() as connection:
+        result = connection.exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+    return result[0]['Plan']
+
+
+def hot_queries():
+    venue = db.session.query(Venue.id, Venue.state, Venue.city).first()
+    artist_id = db.session.query(Artist.id).limit(1).scalar()
+    now = datetime.now()
+
+    return [
+        ('venue shows', 'ix_shows_venue_id_start_time',
+         Show.query.filter(Show.venue_id == venue.id).order_by(
+             Show.start_time)),
+        ('artist shows', 'ix_shows_artist_id_start_time',
+         Show.query.filter(Show.artist_id == artist_id).order_by(
+             Show.start_time)),
+        ('area venues', 'ix_venues_state_city',
+         Venue.query.filter_by(state=venue.state, city=venue.city)),
+        ('venue search', 'ix_venues_name_trgm',
+         Venue.query.filter(Venue.name.ilike('%hall%'))),
+        ('artist search', 'ix_artists_name_trgm',
+         Artist.query.filter(Artist.name.ilike('%band%'))),
+        ('venue bookings', 'shows_venue_no_overlap',
+         Show.query.filter(Show.venue_id == venue.id, SHOW_PERIOD.op('&&')(
+             func.tsrange(now, now + timedelta(days=1))))),
+        ('venue genres', 'ix_venues_genres',
+         Venue.query.filter(*facet_filters(Venue, {
+             'genres': ['Jazz', 'Blues'], 'match': 'all',
+             'state': None, 'city': None}))),
+        ('artist genres', 'ix_artists_genres',
+         Artist.query.filter(*facet_filters(Artist, {
+             'genres': ['Jazz'], 'match': 'any',
+             'state': None, 'city': None}))),
+        ('artist area', 'ix_artists_state_city',
+         Artist.query.filter_by(state=venue.state, city=venue.city)),
+        ('shows listing', 'ix_shows_start_time',
+         Show.query.order_by(Show.start_time).limit(50)),
+    ]
+
+
+if __name__ == '__main__':
+    failures = 0
+
+    with app.app_context():
+        for label, index_name, query in hot_queries():
+            used = index_scans(explain(query))
+            ok = index_name in used
+            failures += not ok
+            print(f'{"ok" if ok else "FAIL":>4} {label:<14} '
+                  f'expected {index_name}, used {sorted(used) or "no index"}')
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,45 @@
+# Measures export throughput and peak Python memory for every table and
+# format. Seed the database first, e.g. `flask fyyur seed --shows 1000000`;
+# peak memory should stay flat as the tables grow.
+#
+#   python -m benchmarks.export [batch_size]
+
+import sys
+import time
+import tracemalloc
+
+from app import app
+from exporter import WRITERS, BATCH_SIZE, export_chunks, pyarrow
+from models import db, Venue, Artist, Show
+
+KINDS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+
+def measure(kind, fmt, batch_size):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = sum(len(chunk) for chunk in export_chunks(
+        kind, fmt, batch_size=batch_size))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.rollback()
+    return elapsed, size, peak
+
+
+if __name__ == '__main__':
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else BATCH_SIZE
+
+    with app.app_context():
+        print(f'{"table":<8} {"format":<8} {"rows":>9} {"rows/s":>10} '
+              f'{"MiB/s":>8} {"peak MiB":>9}')
+        for kind, model in KINDS.items():
+            rows = db.session.query(model).count()
+            for fmt in WRITERS:
+                if fmt == 'parquet' and pyarrow is None:
+                    continue
+                elapsed, size, peak = measure(kind, fmt, batch_size)
+                print(f'{kind:<8} {fmt:<8} {rows:>9} '
+                      f'{rows / elapsed:>10.0f} '
+                      f'{size / elapsed / 2 ** 20:>8.1f} '
+                      f'{peak / 2 ** 20:>9.1f}')
@@ -0,0 +1,99 @@
+# Load test of the connection pool: a fixed number of threads hammers a
+# mix of read routes, once per pool size, and the throughput, latency and
+# pool timeouts are reported side by side. Every pool size runs in its own
+# process because the engine is created once per process from DB_POOL_*.
+# Seed the database first, e.g. `flask fyyur seed`.
+#
+#   python -m benchmarks.pool [--sizes 1 2 5 10 20] [--threads 32]
+#                             [--seconds 10]
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROUTES = ('/venues', '/artists', '/shows', '/venues/{venue_id}',
+          '/artists/{artist_id}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1, 2, 5, 10, 20])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_worker(args):
+    from app import app
+    from models import db, Venue, Artist
+
+    app.logger.setLevel(logging.WARNING)
+    with app.app_context():
+        ids = {'venue_id': db.session.query(Venue.id).limit(1).scalar(),
+               'artist_id': db.session.query(Artist.id).limit(1).scalar()}
+    urls = [route.format(**ids) for route in ROUTES]
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.seconds
+
+    def hammer(offset):
+        client = app.test_client()
+        done = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.get(urls[done % len(urls)])
+            response.get_data()
+            response.close()
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(response.status_code)
+            done += 1
+
+    threads = [threading.Thread(target=hammer, args=(offset,))
+               for offset in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ordered = sorted(latencies) or [0]
+    json.dump({
+        'requests_per_second': len(latencies) / args.seconds,
+        'p50': statistics.median(ordered),
+        'p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        'errors': len(errors),
+    }, sys.stdout)
+
+
+def main():
+    args = parse_args()
+    if args.worker is not None:
+        return run_worker(args)
+
+    print(f'{args.threads} threads, {args.seconds:g}s per pool size')
+    print(f'{"pool":>5} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} '
+          f'{"errors":>7}')
+    for size in args.sizes:
+        env = dict(os.environ, DB_POOL_SIZE=str(size), DB_MAX_OVERFLOW='0',
+                   CACHE_BACKEND='null')
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.pool', '--worker', str(size),
+             '--threads', str(args.threads), '--seconds', str(args.seconds)],
+            env=env, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        print(f'{size:>5} {result["requests_per_second"]:>9.1f} '
+              f'{result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+              f'{result["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# Drives every read route of app.py through the Flask test client and
+# reports latency percentiles, SQL statements and memory per request.
+# Seed the database first, e.g. `flask fyyur seed --shows 100000`.
+#
+#   python -m benchmarks.run [--requests 50] [--json results.json]
+#   python -m benchmarks.run --compare main HEAD
+#
+# --compare checks both revisions out into temporary git worktrees and
+# runs this script against each of them with the same database.
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SEARCH_TERMS = ('jazz', 'the blue', 'hall 1')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=50,
+                        help='timed requests per route')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the page cache enabled')
+    parser.add_argument('--app-dir', default=os.getcwd(),
+                        help='checkout whose app.py is benchmarked')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'),
+                        help='benchmark two git revisions and compare')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative p95 slowdown reported as regression')
+    return parser.parse_args()
+
+
+def load_app(app_dir, use_cache):
+    if not use_cache:
+        os.environ['CACHE_BACKEND'] = 'null'
+    sys.path.insert(0, app_dir)
+    os.chdir(app_dir)
+    from app import app
+    from models import db
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.logger.setLevel(logging.WARNING)
+    return app, db
+
+
+def route_cases(app, db):
+    from models import Venue, Artist
+
+    with app.app_context():
+        values = {
+            'venue_id': db.session.query(Venue.id).limit(1).scalar(),
+            'artist_id': db.session.query(Artist.id).limit(1).scalar(),
+            'when': 'past',
+        }
+
+    cases = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static' or rule.rule.startswith('/__'):
+            continue
+        if not rule.arguments <= values.keys():
+            continue
+        url = rule.build({name: values[name] for name in rule.arguments})[1]
+        if 'GET' in rule.methods:
+            cases.append((f'GET {rule.rule}', 'GET', url, None))
+        elif rule.endpoint.startswith('search_'):
+            for term in SEARCH_TERMS:
+                cases.append((f'POST {rule.rule} {term!r}', 'POST', url,
+                              {'search_term': term}))
+    return sorted(cases)
+
+
+def request(client, method, url, data):
+    response = client.open(url, method=method, data=data)
+    response.get_data()
+    response.close()
+    return response.status_code
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def benchmark(app, db, iterations):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    statements = []
+    event.listen(Engine, 'before_cursor_execute',
+                 lambda *args: statements.append(1))
+
+    client = app.test_client()
+    results = {}
+    for label, method, url, data in route_cases(app, db):
+        status = request(client, method, url, data)
+
+        latencies = []
+        statements.clear()
+        for _ in range(iterations):
+            started = time.perf_counter()
+            request(client, method, url, data)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries = len(statements) / iterations
+
+        # Memory is measured on a separate request; tracemalloc would
+        # distort the timings above.
+        tracemalloc.start()
+        request(client, method, url, data)
+        memory = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        results[label] = {
+            'status': status,
+            'p50': statistics.median(latencies),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'queries': queries,
+            'memory_kb': memory,
+        }
+    return results
+
+
+def print_report(results):
+    print(f'{"route":<48} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} '
+          f'{"p99 ms":>9} {"queries":>8} {"peak KiB":>9}')
+    for label, row in results.items():
+        print(f'{label:<48} {row["status"]:>6} {row["p50"]:>9.2f} '
+              f'{row["p95"]:>9.2f} {row["p99"]:>9.2f} {row["queries"]:>8.1f} '
+              f'{row["memory_kb"]:>9.0f}')
+
+
+def run_revision(revision, args, workdir):
+    checkout = os.path.join(workdir, revision.replace('/', '_'))
+    output = checkout + '.json'
+    subprocess.run(['git', 'worktree', 'add', '--detach', checkout,
+                    revision], check=True)
+    try:
+        command = [sys.executable, os.path.abspath(__file__),
+                   '--app-dir', checkout, '--json', output,
+                   '--requests', str(args.requests)]
+        if args.cache:
+            command.append('--cache')
+        subprocess.run(command, check=True)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', checkout],
+                       check=True)
+    with open(output) as results:
+        return json.load(results)
+
+
+def compare(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        base, head = (run_revision(revision, args, workdir)
+                      for revision in args.compare)
+
+    regressions = 0
+    print(f'{"route":<48} {"p95 base":>9} {"p95 head":>9} {"change":>8} '
+          f'{"queries":>13}')
+    for label in sorted(base.keys() & head.keys()):
+        before, after = base[label], head[label]
+        change = after['p95'] / before['p95'] - 1 if before['p95'] else 0
+        regressed = (change > args.threshold
+                     or after['queries'] > before['queries'])
+        regressions += regressed
+        print(f'{label:<48} {before["p95"]:>9.2f} {after["p95"]:>9.2f} '
+              f'{change:>+8.1%} {before["queries"]:>6.1f}->'
+              f'{after["queries"]:<6.1f}{"  REGRESSION" if regressed else ""}')
+    return 1 if regressions else 0
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        return compare(args)
+
+    app, db = load_app(os.path.abspath(args.app_dir), args.cache)
+    results = benchmark(app, db, args.requests)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# Compares ranked full-text search against the previous ilike search on
+# synthetic venues. The rows are inserted inside a transaction that is
+# rolled back at the end, so the database is left untouched.
+#
+#   python -m benchmarks.search [rows] [iterations]
+
+import sys
+import time
+
+from sqlalchemy import text
+
+from app import app
+from models import db, Venue
+from search import search_entities
+
+SYNTHETIC_VENUES = """
+INSERT INTO venues (name, city, state, address, phone, image_link, genres,
+                    seeking_talent)
+SELECT (ARRAY['The', 'Blue', 'Old', 'Grand', 'Little'])[1 + n % 5] || ' ' ||
+       (ARRAY['Jazz', 'Rock', 'Folk', 'Soul', 'Punk', 'Blues'])[1 + n % 6] ||
+       ' ' || (ARRAY['Hall', 'Saloon', 'Club', 'Lounge'])[1 + n % 4] ||
+       ' ' || n,
+       (ARRAY['San Francisco', 'New York', 'Austin', 'Nashville'])[1 + n % 4],
+       (ARRAY['CA', 'NY', 'TX', 'TN'])[1 + n % 4],
+       n || ' Main Street', '5550100', 'https://example.com/venue.png',
+       ARRAY[(ARRAY['Jazz', 'Rock', 'Folk', 'Soul'])[1 + n % 4]], false
+FROM generate_series(1, :rows) AS n
+"""
+
+TERMS = ('jazz', 'blue jazz sal', 'hall 4242', 'nashville soul')
+
+
+def legacy_search(search_term):
+    return Venue.query.filter(
+        Venue.name.ilike(f'%{search_term}%')
+    ).limit(20).all()
+
+
+def measure(run, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for term in TERMS:
+            run(term)
+    return (time.perf_counter() - started) / (iterations * len(TERMS)) * 1000
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with app.app_context():
+        try:
+            db.session.execute(text(SYNTHETIC_VENUES), {'rows': rows})
+            db.session.execute(text('ANALYZE venues'))
+
+            for label, run in (
+                    ('ilike', legacy_search),
+                    ('tsvector', lambda term: search_entities(
+                        Venue, term))):
+                print(f'{label:>8}: {measure(run, iterations):10.2f} '
+                      f'ms/search over {rows} synthetic venues')
+        finally:
+            db.session.rollback()
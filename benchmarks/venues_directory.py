@@ -0,0 +1,101 @@
+# Compares the /venues directory read from the venue_areas table against
+# the previous implementations: grouping the venues table on every
+# request, and the original query per area. Run from the repository root
+# against a seeded database:
+#
+#   python -m benchmarks.venues_directory [iterations]
+
+import sys
+import time
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import event
+
+from app import app
+from models import db, Venue
+from utils import get_venue_areas_payload
+
+
+def legacy_venue_areas_payload():
+    places = Venue.query.distinct(Venue.city, Venue.state).order_by(
+        Venue.state
+    ).all()
+
+    areas = []
+
+    for place in places:
+        venues_query = Venue.query.filter_by(
+            state=place.state,
+            city=place.city
+        ).order_by(
+            Venue.name
+        ).all()
+
+        areas.append({
+            'city': place.city,
+            'state': place.state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': len([show for show in venue.shows if
+                                           show.start_time > datetime.now()])
+            } for venue in venues_query]
+        })
+
+    return areas
+
+
+def grouped_venue_areas_payload():
+    rows = db.session.query(
+        Venue.state,
+        Venue.city,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).order_by(
+        Venue.state, Venue.city, Venue.name
+    ).all()
+
+    return [{
+        'city': city,
+        'state': state,
+        'venues': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in area_rows]
+    } for (state, city), area_rows in groupby(
+        rows, key=lambda row: (row.state, row.city))]
+
+
+def measure(build_payload, iterations):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            build_payload()
+            db.session.remove()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+    return elapsed / iterations * 1000, len(statements) / iterations
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    with app.app_context():
+        for label, build_payload in (
+                ('legacy', legacy_venue_areas_payload),
+                ('grouped', grouped_venue_areas_payload),
+                ('snapshot', get_venue_areas_payload)):
+            latency, queries = measure(build_payload, iterations)
+            print(f'{label:>8}: {latency:10.2f} ms/request '
+                  f'{queries:8.1f} queries/request')
@@ -0,0 +1,198 @@
+import bisect
+from datetime import timedelta
+
+from sqlalchemy import (DateTime, Integer, Interval, and_, column, exists,
+                        func, literal_column, select, values)
+
+from constants import SEARCH_PAGE_SIZE
+from models import db, Venue, Show
+
+# SQLSTATE of a violated exclusion constraint.
+EXCLUSION_VIOLATION = '23P01'
+
+# The period a show occupies its venue, as in the shows_venue_no_overlap
+# exclusion constraint. Queries must use the same expression for the
+# constraint's GiST index to answer them.
+SHOW_PERIOD = func.tsrange(
+    Show.start_time,
+    Show.start_time + Show.duration_minutes * literal_column(
+        "interval '1 minute'", type_=Interval))
+
+
+class VenueShows:
+    """The shows of one venue as [start, end) intervals sorted by start.
+
+    max_ends[i] is the latest end among the first i + 1 intervals, so a
+    search walks back from the last interval starting before the query
+    ends and stops as soon as nothing earlier reaches into it. Shows at
+    a venue do not overlap, so that is O(log n + conflicts).
+    """
+
+    def __init__(self, rows=()):
+        rows = sorted((start, end, show_id) for show_id, start, end in rows
+                      if end > start)
+        self.starts = [start for start, _, _ in rows]
+        self.ends = [end for _, end, _ in rows]
+        self.ids = [show_id for _, _, show_id in rows]
+        self.max_ends = []
+        self.reindex(0)
+
+    def reindex(self, position):
+        del self.max_ends[position:]
+        latest = self.max_ends[-1] if self.max_ends else None
+        for end in self.ends[position:]:
+            latest = end if latest is None else max(latest, end)
+            self.max_ends.append(latest)
+
+    def add(self, show_id, start, end):
+        # Empty periods never overlap anything, as in PostgreSQL.
+        if end <= start:
+            return
+        position = bisect.bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.ids.insert(position, show_id)
+        self.reindex(position)
+
+    def remove(self, show_id):
+        if show_id not in self.ids:
+            return
+        position = self.ids.index(show_id)
+        del self.starts[position], self.ends[position], self.ids[position]
+        self.reindex(position)
+
+    def overlapping(self, start, end):
+        if end <= start:
+            return []
+        position = bisect.bisect_left(self.starts, end)
+        found = []
+        while position > 0 and self.max_ends[position - 1] > start:
+            position -= 1
+            if self.ends[position] > start:
+                found.append((self.ids[position], self.starts[position],
+                              self.ends[position]))
+        return found[::-1]
+
+
+def show_end(start, duration_minutes):
+    return start + timedelta(minutes=duration_minutes)
+
+
+def load_venue_shows(venue_id, start, end):
+    """The shows at the venue that may overlap [start, end), as VenueShows.
+
+    Portable: the shows are selected by start time on the (venue_id,
+    start_time) index, reaching back by the longest show at the venue,
+    and their ends are computed here.
+    """
+    longest = db.session.query(func.max(Show.duration_minutes)).filter(
+        Show.venue_id == venue_id).scalar()
+    if longest is None:
+        return VenueShows()
+    rows = db.session.execute(select(
+        Show.id, Show.start_time, Show.duration_minutes
+    ).where(
+        Show.venue_id == venue_id,
+        Show.start_time < end,
+        Show.start_time > start - timedelta(minutes=longest)))
+    return VenueShows((show_id, show_start, show_end(show_start, duration))
+                      for show_id, show_start, duration in rows)
+
+
+def booked_overlaps(periods):
+    """A booked show overlapping each of these periods, where there is one.
+
+    periods are (key, venue_id, start, end) tuples; returns {key: show id}.
+    """
+    if not periods:
+        return {}
+    if db.engine.dialect.name == 'postgresql':
+        return probe_booked_overlaps(periods)
+    return search_booked_overlaps(periods)
+
+
+def probe_booked_overlaps(periods):
+    # One query: the periods, as VALUES, probe the exclusion constraint's
+    # GiST index on (venue_id, period).
+    wanted = values(
+        column('key', Integer), column('venue_id', Integer),
+        column('start_time', DateTime), column('end_time', DateTime),
+        name='wanted').data(periods)
+    return dict(db.session.execute(select(
+        wanted.c.key, func.min(Show.id)
+    ).join(Show, and_(
+        Show.venue_id == wanted.c.venue_id,
+        SHOW_PERIOD.op('&&')(func.tsrange(wanted.c.start_time,
+                                          wanted.c.end_time))
+    )).group_by(wanted.c.key)).all())
+
+
+def search_booked_overlaps(periods):
+    # Each venue's shows are loaded around that venue's own periods only.
+    by_venue = {}
+    for period in periods:
+        by_venue.setdefault(period[1], []).append(period)
+    found = {}
+    for venue_id, venue_periods in by_venue.items():
+        shows = load_venue_shows(
+            venue_id, min(start for _, _, start, _ in venue_periods),
+            max(end for _, _, _, end in venue_periods))
+        for key, _, start, end in venue_periods:
+            conflicts = shows.overlapping(start, end)
+            if conflicts:
+                found[key] = conflicts[0][0]
+    return found
+
+
+def find_conflicts(venue_id, start, duration_minutes, exclude_show_id=None):
+    """Shows at the venue overlapping [start, start + duration).
+
+    Returns (show_id, start, end) tuples ordered by start.
+    """
+    end = show_end(start, duration_minutes)
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.session.execute(select(
+            Show.id, Show.start_time, Show.duration_minutes
+        ).where(
+            Show.venue_id == venue_id,
+            SHOW_PERIOD.op('&&')(func.tsrange(start, end))
+        ).order_by(Show.start_time))
+        conflicts = [(show_id, show_start, show_end(show_start, duration))
+                     for show_id, show_start, duration in rows]
+    else:
+        # No exclusion constraint to probe: select the venue's shows
+        # around the period and search them here.
+        conflicts = load_venue_shows(venue_id, start, end).overlapping(
+            start, end)
+    return [conflict for conflict in conflicts
+            if conflict[0] != exclude_show_id]
+
+
+def available_venues(state, city, start, end, page=1, limit=SEARCH_PAGE_SIZE):
+    """Venues in the city with no show overlapping [start, end).
+
+    A single anti-join: each venue of the city probes the shows'
+    exclusion constraint index on (venue_id, period) for one overlap,
+    so no show is loaded.
+    """
+    booked = exists().where(
+        Show.venue_id == Venue.id,
+        SHOW_PERIOD.op('&&')(func.tsrange(start, end)))
+    in_city = (Venue.state == state, Venue.city == city, ~booked)
+
+    rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.address,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(*in_city).order_by(
+        Venue.name, Venue.id
+    ).limit(limit).offset((page - 1) * limit).all()
+    count = db.session.query(func.count(Venue.id)).filter(*in_city).scalar()
+
+    return {
+        "count": count,
+        "page": page,
+        "pages": max((count + limit - 1) // limit, 1),
+        "data": [row._asdict() for row in rows]
+    }
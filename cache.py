@@ -0,0 +1,329 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import abort, current_app, g, make_response, request, session
+from sqlalchemy import event
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Response
+
+from models import db, Venue, Artist, Show
+
+# A tag every invalidation renews, to notice writes made while a value
+# whose tags are only known once it is built was being built.
+ANY_TAG = '*'
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry TTL and a size bound."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend:
+    """Store backed by any client with redis-py's get/set/delete API.
+
+    Tests can pass a local stand-in object as the client.
+    """
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    @property
+    def evictions(self):
+        info = getattr(self.client, 'info', None)
+        return info('stats').get('evicted_keys', 0) if info else 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class Cache:
+    """Tag-aware cache for rendered pages and payload dicts.
+
+    Every entry remembers the version of each tag it was built from.
+    Invalidating a tag gives it a new version, so the entries built from
+    the old one are treated as misses. A tag whose version was evicted
+    gets a fresh version as well, which errs on the side of a miss.
+
+    The versions are read before the value is built from the database, so
+    an entry built while a write commits is a miss afterwards instead of
+    holding old data under the new version.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+
+        if backend == 'memory':
+            self.backend = MemoryBackend(
+                app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            import redis
+            self.backend = RedisBackend(
+                redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        else:
+            self.backend = None
+
+        app.extensions['cache'] = self
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _tag_version(self, tag):
+        version = self.backend.get('tag:' + tag)
+        if version is None:
+            version = os.urandom(8).hex()
+            self.backend.set('tag:' + tag, version)
+        return version
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        entry = self.backend.get('entry:' + key)
+        if entry is not None:
+            value, versions = entry
+            if all(self._tag_version(tag) == version
+                   for tag, version in versions.items()):
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def versions(self, tags):
+        """The current versions of these tags, to pass to set()."""
+        if not self.enabled:
+            return {}
+        return {tag: self._tag_version(tag) for tag in tags}
+
+    def set(self, key, value, tags=(), ttl=None, versions=None):
+        """Store a value built from the data of these tags.
+
+        Pass the versions read before building it; without them the
+        current versions are used.
+        """
+        if not self.enabled:
+            return
+        if versions is None:
+            versions = self.versions(tags)
+        self.backend.set('entry:' + key, (value, versions),
+                         ttl or self.default_ttl)
+
+    def remember(self, key, build, tags=(), ttl=None):
+        value = self.get(key)
+        if value is not None:
+            return value
+        if not self.enabled:
+            return build()
+        if not callable(tags):
+            versions = self.versions(tags)
+            value = build()
+        else:
+            # The tags come from the value. Its versions are only right
+            # if no tag at all was invalidated while it was being built.
+            generation = self._tag_version(ANY_TAG)
+            value = build()
+            versions = self.versions(tags(value))
+            if self._tag_version(ANY_TAG) != generation:
+                return value
+        self.set(key, value, ttl=ttl, versions=versions)
+        return value
+
+    def invalidate(self, *tags):
+        if not self.enabled or not tags:
+            return
+        for tag in (*tags, ANY_TAG):
+            self.backend.set('tag:' + tag, os.urandom(8).hex())
+        self.invalidations += len(tags)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions if self.enabled else 0,
+            'invalidations': self.invalidations,
+        }
+
+
+cache = Cache()
+
+
+def cached_page(*tags):
+    """Cache the HTML of a GET view under its full path.
+
+    Pages are not cached while flashed messages are pending, because the
+    layout renders them into the body.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not cache.enabled or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            key = 'page:' + request.full_path
+            body = cache.get(key)
+            if body is not None:
+                return body
+
+            versions = cache.versions(tags)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            if response.is_streamed:
+                response.response = _store_when_streamed(
+                    response.response, key, versions)
+            else:
+                cache.set(key, response.get_data(as_text=True),
+                          versions=versions)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_page(get_version):
+    """Answer conditional GETs of a view from the version of its data.
+
+    get_version is called with the view arguments and returns when the
+    data shown on the page last changed and a token that changes whenever
+    it does, or None if there is none (404). A client or CDN holding the
+    current version gets a 304 without the page being built.
+
+    The view finds the ETag in g.page_version. Data it caches must be
+    keyed by it: a tag invalidation only reaches the cache of the process
+    that made the change when the memory backend is used, while the
+    version is read from the database by every process.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = get_version(*args, **kwargs)
+            if version is None:
+                abort(404)
+            last_modified, token = version
+            config = current_app.config
+            etag = g.page_version = hashlib.blake2b(
+                f'{config["RELEASE"]}:{request.path}:{token}'.encode(),
+                digest_size=16).hexdigest()
+
+            if '_flashes' in session:
+                # The flashed messages are part of this response only.
+                response = make_response(view(*args, **kwargs))
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                return response
+
+            if is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified):
+                response = make_response(view(*args, **kwargs))
+            else:
+                response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = (
+                f'public, max-age=0, s-maxage={config["HTTP_CACHE_MAX_AGE"]}, '
+                f'stale-while-revalidate='
+                f'{config["HTTP_CACHE_STALE_WHILE_REVALIDATE"]}')
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _store_when_streamed(chunks, key, versions):
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(
+        chunk.decode() if isinstance(chunk, bytes) else chunk
+        for chunk in body), versions=versions)
+
+
+def tags_for(instance):
+    if isinstance(instance, Venue):
+        return {'venues', f'venue:{instance.id}'}
+    if isinstance(instance, Artist):
+        return {'artists', f'artist:{instance.id}'}
+    if isinstance(instance, Show):
+        return {'shows', 'venues', f'venue:{instance.venue_id}',
+                f'artist:{instance.artist_id}'}
+    return set()
+
+
+def mark_stale(session, *tags):
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_stale_tags(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        mark_stale(session, *tags_for(instance))
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_stale_tags(session):
+    cache.invalidate(*session.info.pop('cache_tags', ()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_stale_tags(session):
+    session.info.pop('cache_tags', None)
@@ -0,0 +1,164 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from areas import rebuild_venue_areas
+from assets import build_assets, page_weight
+from cache import mark_stale
+from counters import (check_show_counters, rebuild_show_counters,
+                      roll_over_show_counters)
+from enums import State
+from exporter import BATCH_SIZE as EXPORT_BATCH_SIZE, WRITERS, export_chunks
+from importer import BATCH_SIZE, READERS, detect_format, import_stream
+from models import db
+from seed import seed_database
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=2000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', 'seed_value', default=0, show_default=True,
+              help='Random seed; the same seed yields the same rows.')
+def seed_command(venues, artists, shows, seed_value):
+    """Fill the database with a synthetic catalogue."""
+    seed_database(venues, artists, shows, seed=seed_value)
+    click.echo(f'Seeded {venues} venues, {artists} artists and '
+               f'{shows} shows.')
+
+
+@fyyur_cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(list(READERS)),
+              help='Input format; guessed from the file name by default.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+@click.option('--method', default='auto', show_default=True,
+              type=click.Choice(['auto', 'copy', 'executemany']),
+              help='auto uses COPY on PostgreSQL.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='Progress file, defaults to PATH.checkpoint.')
+def import_command(kind, path, fmt, batch_size, method, checkpoint):
+    """Load venues, artists or shows from a CSV or NDJSON file.
+
+    Rows are validated with the rules of the create forms and loaded in
+    committed batches. Rejected rows are listed with their line number.
+    Progress is saved after every batch, so running the same command
+    again after a failure resumes where it stopped. The progress file is
+    removed once the whole file is imported.
+    """
+    def report_batch(batch):
+        click.echo(f'lines {batch["first_line"]}-{batch["last_line"]}: '
+                   f'{batch["inserted"]} inserted, '
+                   f'{batch["rejected"]} rejected')
+
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        report = import_stream(
+            kind, stream, fmt or detect_format(path), batch_size=batch_size,
+            method=method, checkpoint=checkpoint or path + '.checkpoint',
+            on_batch=report_batch)
+
+    for line, field, message in report.errors:
+        click.echo(f'line {line}: {field}: {message}', err=True)
+    click.echo(f'Imported {report.inserted} {kind}, rejected '
+               f'{report.rejected}.')
+    if report.failed:
+        raise click.ClickException(
+            f'Batch at lines {report.failed["first_line"]}-'
+            f'{report.failed["last_line"]} failed: '
+            f'{report.failed["message"]}. Fix it and run the command again '
+            f'to resume after line {report.last_line}.')
+
+
+@fyyur_cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'fmt', default='csv', show_default=True,
+              type=click.Choice(list(WRITERS)))
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False,
+              allow_dash=True), help='Target file, stdout by default.')
+@click.option('--since', type=click.DateTime(),
+              help='Only shows starting at or after this date.')
+@click.option('--until', type=click.DateTime(),
+              help='Only shows starting before this date.')
+@click.option('--state', type=click.Choice([state.value for state in State]),
+              help='Only venues or artists in this state, or shows at '
+                   'venues in it.')
+@click.option('--batch-size', default=EXPORT_BATCH_SIZE, show_default=True)
+def export_command(kind, fmt, output, since, until, state, batch_size):
+    """Stream venues, artists or shows to CSV, NDJSON or Parquet.
+
+    For venues and artists the date range keeps those with at least one
+    show in it.
+    """
+    try:
+        chunks = export_chunks(kind, fmt, since=since, until=until,
+                               state=state, batch_size=batch_size)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    with click.open_file(output, 'wb') as target:
+        for chunk in chunks:
+            target.write(chunk)
+
+
+@fyyur_cli.command('roll-counters')
+def roll_counters_command():
+    """Move shows that have started from upcoming to past counters.
+
+    Schedule it, e.g. every five minutes from cron; the counters lag
+    behind the clock by at most the interval between runs.
+    """
+    moved = roll_over_show_counters()
+    click.echo(f'Moved {moved} shows to past.')
+
+
+@fyyur_cli.command('check-counters')
+@click.option('--rebuild', is_flag=True,
+              help='Recompute the counters that are off.')
+def check_counters_command(rebuild):
+    """Compare the show counters of venues and artists with the shows."""
+    mismatches = check_show_counters()
+    for table, row_id, stored, actual in mismatches:
+        click.echo(f'{table} {row_id}: stored upcoming/past {stored[0]}/'
+                   f'{stored[1]}, actual {actual[0]}/{actual[1]}')
+    click.echo(f'{len(mismatches)} counters are off.')
+    if rebuild:
+        click.echo(f'Rebuilt {rebuild_show_counters()} counters.')
+    elif mismatches:
+        raise SystemExit(1)
+
+
+@fyyur_cli.command('rebuild-areas')
+def rebuild_areas_command():
+    """Recompute the /venues directory from the venues table.
+
+    The directory is refreshed area by area on every write made through
+    the app or the importer; run this after changing venues or shows
+    with SQL by hand.
+    """
+    rebuild_venue_areas(db.session)
+    mark_stale(db.session, 'venues')
+    db.session.commit()
+    click.echo('Rebuilt the venue area directory.')
+
+
+@fyyur_cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify and fingerprint static files into static/dist/.
+
+    Run it on deploy, before the app starts; the templates link the
+    files from static/dist/manifest.json, or the sources without it.
+    """
+    static_folder = current_app.static_folder
+    manifest, sizes = build_assets(static_folder)
+    click.echo(f'Wrote {len(manifest)} assets.')
+    click.echo(f'{"layout":<10} {"requests":>13} {"KiB before":>11} '
+               f'{"minified":>9} {"transfer":>9}')
+    for layout, weight in page_weight(static_folder, sizes).items():
+        click.echo(f'{layout:<10} '
+                   f'{weight["requests_before"]:>6} -> '
+                   f'{weight["requests_after"]:<3} '
+                   f'{weight["bytes_before"] / 1024:>11.1f} '
+                   f'{weight["bytes_minified"] / 1024:>9.1f} '
+                   f'{weight["bytes_after"] / 1024:>9.1f}')
@@ -7,8 +7,125 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
+
+def env_flag(name, default):
+    return os.environ.get(name, str(int(default))).lower() in (
+        '1', 'true', 'yes', 'on')
+
+
 # Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur')
+
+# Connection pool, per process: with gunicorn the database sees up to
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections. Pre-ping and
+# recycling drop connections that died with a failover before a request
+# gets them. DB_POOL_TIMEOUT is how long a request waits for a free
+# connection before failing.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+
+# Set when DATABASE_URL points at PgBouncer in transaction pooling mode.
+# PgBouncer then owns the pooling, so the app opens a connection per
+# checkout and must not rely on session state (SET, prepared statements,
+# advisory locks, cursors outside a transaction) surviving a commit.
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', False)
+
+SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': DB_POOL_PRE_PING}
+if DB_PGBOUNCER:
+    from sqlalchemy.pool import NullPool
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
+elif not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    # SQLite has no server connections to pool.
+    SQLALCHEMY_ENGINE_OPTIONS.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
+# Run the independent queries of the venue and artist pages concurrently
+# on an asyncpg engine; asgi.py turns it on. Reads go to the primary.
+ASYNC_DB_ENABLED = env_flag('ASYNC_DB', False)
+
+# Read replicas, as comma-separated URLs. Reads of GET requests (and of
+# views marked @read_only) go to a replica lagging at most
+# DB_REPLICA_MAX_LAG seconds, checked in the background every
+# DB_REPLICA_CHECK_INTERVAL seconds; a replica that does not answer the
+# check within DB_REPLICA_CHECK_TIMEOUT seconds is skipped.
+# After a client writes, its reads stay on the primary for
+# DB_REPLICA_LAG_TOLERANCE seconds so it sees its own changes; it must be
+# at least DB_REPLICA_MAX_LAG, the lag a replica in use may have.
+DATABASE_REPLICA_URLS = [
+    url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+    if url]
+SQLALCHEMY_BINDS = {f'replica_{number}': url
+                    for number, url in enumerate(DATABASE_REPLICA_URLS)}
+DB_REPLICA_BINDS = tuple(SQLALCHEMY_BINDS)
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 30))
+DB_REPLICA_CHECK_INTERVAL = 10
+DB_REPLICA_CHECK_TIMEOUT = 2
+DB_REPLICA_LAG_TOLERANCE = float(
+    os.environ.get('DB_REPLICA_LAG_TOLERANCE', DB_REPLICA_MAX_LAG))
+DB_REPLICA_STICKY_COOKIE = 'fyyur_primary'
+
+# Raise instead of silently lazy loading relationships the endpoint did not
+# ask for. Enable in tests to keep the number of queries per view bounded.
+SQLALCHEMY_RAISE_ON_LAZY_LOAD = False
+
+# Page size of the /shows listing, overridable per request with ?limit=
+SHOWS_PER_PAGE = 60
+SHOWS_MAX_PER_PAGE = 500
+
+# /autocomplete serves each worker's in-memory index of venue and artist
+# names. It is rebuilt in the background once older than
+# AUTOCOMPLETE_MAX_AGE seconds to pick up other workers' writes; a table
+# with more than AUTOCOMPLETE_MAX_NAMES rows is queried instead.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_MAX_AGE = int(os.environ.get('AUTOCOMPLETE_MAX_AGE', 300))
+AUTOCOMPLETE_MAX_NAMES = int(os.environ.get('AUTOCOMPLETE_MAX_NAMES',
+                                            2000000))
+
+# Page size of /api/v1 listings, overridable per request with ?limit=
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+# Most ids accepted by one bulk DELETE /api/v1/<venues|artists> request.
+API_MAX_BULK_DELETE = 1000
+
+# Page and payload cache: 'memory' (per process LRU), 'redis' or 'null'.
+# Use redis when running several workers so invalidations are shared.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_MAX_ENTRIES = 1024
+CACHE_DEFAULT_TTL = 60
+# Facet counts are invalidated by every write to their table, so they can
+# be kept much longer; the TTL only ages out unused filter combinations.
+FACET_CACHE_TTL = 24 * 3600
+
+# HTTP caching of the venue and artist pages. They carry an ETag and
+# Last-Modified from the updated_at and row_version columns, so
+# revalidations are answered with 304 before the page is built. Browsers
+# revalidate every time; shared caches (the CDN) may serve a page for
+# HTTP_CACHE_MAX_AGE seconds and a stale one for
+# HTTP_CACHE_STALE_WHILE_REVALIDATE more while they refetch it. RELEASE is
+# part of the ETag, so a deploy that changes the templates invalidates
+# them; Heroku's dyno metadata provides it.
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 60))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(
+    os.environ.get('HTTP_CACHE_STALE_WHILE_REVALIDATE', 600))
+RELEASE = os.environ.get('RELEASE', os.environ.get('HEROKU_SLUG_COMMIT', ''))
+
+# Request instrumentation: a statement shape repeated more than
+# SQL_REPEAT_THRESHOLD times in one request is logged as a likely N+1.
+# A PROFILE_SAMPLE_RATE share of requests is profiled with cProfile and
+# dumped to PROFILE_DIR, one .prof file per request.
+SQL_REPEAT_THRESHOLD = 10
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_DIR = os.path.join(basedir, 'profiles')
 
 # Silence the error
 SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -1 +1,5 @@
 STRFTIME_FORMAT = "%m/%d/%Y, %H:%M:%S"
+SHOWS_PAGE_SIZE = 12
+SEARCH_PAGE_SIZE = 20
+DEFAULT_SHOW_DURATION = 120
+MAX_SHOW_DURATION = 24 * 60
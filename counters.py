@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+from areas import mark_areas_stale, rebuild_venue_areas
+from cache import mark_stale
+from models import db, Venue, Artist, Show, show_counters_rollover
+
+OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def lock_rollover(exclusive):
+    query = select(show_counters_rollover.c.rolled_at)
+    query = query.with_for_update(read=not exclusive)
+    return db.session.execute(query).scalar_one()
+
+
+def roll_over_show_counters(now=None):
+    """Move the shows that started since the last roll-over to past.
+
+    Run it on a schedule; between runs a show that has started still
+    counts as upcoming. Returns the number of shows moved.
+    """
+    now = now or datetime.now()
+    rolled_at = lock_rollover(exclusive=True)
+    if now <= rolled_at:
+        db.session.rollback()
+        return 0
+
+    window = (Show.start_time > rolled_at, Show.start_time <= now)
+    moved = db.session.query(func.count(Show.id)).filter(*window).scalar()
+    if moved:
+        for model, owner_column in OWNERS:
+            started = select(
+                owner_column.label('id'),
+                func.count(Show.id).label('started')
+            ).where(*window).group_by(owner_column).subquery()
+            db.session.execute(update(model).where(
+                model.id == started.c.id
+            ).values(
+                upcoming_shows_count=model.upcoming_shows_count
+                - started.c.started,
+                past_shows_count=model.past_shows_count + started.c.started
+            ).execution_options(synchronize_session=False))
+        mark_stale(db.session, 'venues', 'artists')
+        mark_areas_stale(db.session, venue_ids=db.session.execute(
+            select(Show.venue_id).where(*window).distinct()).scalars())
+
+    db.session.execute(update(show_counters_rollover).values(rolled_at=now))
+    db.session.commit()
+    return moved
+
+
+def counter_mismatches(model, owner_column, rolled_at):
+    actual = select(
+        owner_column.label('id'),
+        func.count(Show.id).filter(
+            Show.start_time > rolled_at).label('upcoming'),
+        func.count(Show.id).filter(
+            Show.start_time <= rolled_at).label('past')
+    ).group_by(owner_column).subquery()
+    upcoming = func.coalesce(actual.c.upcoming, 0)
+    past = func.coalesce(actual.c.past, 0)
+    return select(
+        model.id,
+        model.upcoming_shows_count.label('stored_upcoming'),
+        model.past_shows_count.label('stored_past'),
+        upcoming.label('upcoming'),
+        past.label('past')
+    ).select_from(model).outerjoin(
+        actual, actual.c.id == model.id
+    ).where(
+        (model.upcoming_shows_count != upcoming)
+        | (model.past_shows_count != past)
+    )
+
+
+def check_show_counters():
+    """List (table, id, stored, actual) for every counter that is off.
+
+    Counts are (upcoming, past) pairs relative to the last roll-over.
+    """
+    rolled_at = lock_rollover(exclusive=False)
+    mismatches = []
+    for model, owner_column in OWNERS:
+        rows = db.session.execute(counter_mismatches(
+            model, owner_column, rolled_at).order_by(model.id))
+        mismatches.extend(
+            (model.__tablename__, row.id,
+             (row.stored_upcoming, row.stored_past), (row.upcoming, row.past))
+            for row in rows)
+    db.session.rollback()
+    return mismatches
+
+
+def rebuild_show_counters(now=None):
+    """Recompute the counters that are off from the shows table.
+
+    Also rolls over to now, so the rebuilt counts are current. Returns
+    the number of venue and artist rows that were corrected.
+    """
+    now = now or datetime.now()
+    lock_rollover(exclusive=True)
+    fixed = 0
+    for model, owner_column in OWNERS:
+        fixes = counter_mismatches(model, owner_column, now).subquery()
+        fixed += db.session.execute(update(model).where(
+            model.id == fixes.c.id
+        ).values(
+            upcoming_shows_count=fixes.c.upcoming,
+            past_shows_count=fixes.c.past
+        ).execution_options(synchronize_session=False)).rowcount
+    db.session.execute(update(show_counters_rollover).values(rolled_at=now))
+    rebuild_venue_areas(db.session)
+    mark_stale(db.session, 'venues', 'artists')
+    db.session.commit()
+    return fixed
@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from sqlalchemy import Boolean, DateTime, Integer, and_
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models import db, Venue, Artist, Show
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+BATCH_SIZE = 5000
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def export_columns(model):
+    # search_vector is derived data and only useful inside PostgreSQL.
+    return [column for column in model.__table__.columns
+            if column.name != 'search_vector']
+
+
+def export_query(kind, since=None, until=None, state=None):
+    """Build the query for one export, without running it."""
+    if kind == 'shows':
+        query = db.session.query(*export_columns(Show)).order_by(Show.id)
+        if since:
+            query = query.filter(Show.start_time >= since)
+        if until:
+            query = query.filter(Show.start_time < until)
+        if state:
+            query = query.join(Venue, Show.venue_id == Venue.id).filter(
+                Venue.state == state)
+        return query
+
+    model, owner_column = ((Venue, Show.venue_id) if kind == 'venues'
+                           else (Artist, Show.artist_id))
+    query = db.session.query(*export_columns(model)).order_by(model.id)
+    if state:
+        query = query.filter(model.state == state)
+    if since or until:
+        # Entities with at least one show in the range.
+        conditions = [owner_column == model.id]
+        if since:
+            conditions.append(Show.start_time >= since)
+        if until:
+            conditions.append(Show.start_time < until)
+        query = query.filter(
+            db.session.query(Show.id).filter(and_(*conditions)).exists())
+    return query
+
+
+def iter_batches(query, batch_size):
+    # yield_per streams the rows through a server-side cursor on
+    # PostgreSQL, so only one batch is held in memory at a time.
+    rows = iter(query.yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    if value is None:
+        return ''
+    return value
+
+
+def write_csv(names, batches, types):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows([csv_value(value) for value in row]
+                         for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def dumps_line(record):
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, default=lambda value: value.isoformat(),
+                       separators=(',', ':')) + '\n').encode()
+
+
+def write_ndjson(names, batches, types):
+    for batch in batches:
+        yield b''.join(dumps_line(dict(zip(names, row))) for row in batch)
+
+
+class ChunkSink:
+    """Write-only file object that hands out what was written so far.
+
+    Parquet is written strictly sequentially, so the file can be streamed
+    as long as tell() keeps counting across the chunks already sent.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def arrow_type(column_type):
+    if isinstance(column_type, ARRAY):
+        return pyarrow.list_(pyarrow.string())
+    if isinstance(column_type, Integer):
+        return pyarrow.int64()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp('us')
+    return pyarrow.string()
+
+
+def write_parquet(names, batches, types):
+    schema = pyarrow.schema([(name, arrow_type(column_type))
+                             for name, column_type in zip(names, types)])
+    sink = ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema,
+                                       compression='snappy') as writer:
+        for batch in batches:
+            # One row group per batch.
+            writer.write_table(pyarrow.Table.from_pylist(
+                [dict(zip(names, row)) for row in batch], schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+WRITERS = {
+    'csv': write_csv,
+    'ndjson': write_ndjson,
+    'parquet': write_parquet,
+}
+
+
+def export_chunks(kind, fmt, since=None, until=None, state=None,
+                  batch_size=BATCH_SIZE):
+    """Yield the export of one table as encoded chunks, one per batch."""
+    if fmt == 'parquet' and pyarrow is None:
+        raise RuntimeError('Parquet export requires pyarrow.')
+    query = export_query(kind, since, until, state)
+    names = [column['name'] for column in query.column_descriptions]
+    types = [column['type'] for column in query.column_descriptions]
+    return WRITERS[fmt](names, iter_batches(query, batch_size), types)
@@ -0,0 +1,87 @@
+import json
+
+from flask import current_app
+from sqlalchemy import func, literal
+
+from cache import cache
+from enums import Genre, State
+from models import db
+from search import build_tsquery, search_tsquery
+
+GENRES = [genre.value for genre in Genre]
+STATES = [state.value for state in State]
+
+# How several selected genres combine: 'all' uses the array containment
+# operator @>, 'any' the overlap operator &&. Both are answered by the
+# GIN indexes on genres.
+MATCHES = ('all', 'any')
+
+
+def parse_facets(values):
+    """Facet filters from query args or form data.
+
+    Unknown genres and states are dropped rather than rejected, so a
+    stale link still shows results.
+    """
+    state = values.get('state')
+    match = values.get('match')
+    return {
+        'genres': sorted(set(values.getlist('genre')) & set(GENRES)),
+        'match': match if match in MATCHES else 'all',
+        'state': state if state in STATES else None,
+        'city': (values.get('city') or '').strip() or None,
+    }
+
+
+def facet_filters(model, facets):
+    filters = []
+    if facets['genres']:
+        # Bound with the column's type: PostgreSQL has no @> between
+        # varchar[] and the text[] an untyped array literal would be.
+        genres = literal(facets['genres'], model.genres.type)
+        operator = '@>' if facets['match'] == 'all' else '&&'
+        filters.append(model.genres.op(operator)(genres))
+    if facets['state']:
+        filters.append(model.state == facets['state'])
+    if facets['city']:
+        filters.append(model.city == facets['city'])
+    return filters
+
+
+def facet_counts(model, facets, search_term=''):
+    """How many of the filtered rows carry each genre, and their total.
+
+    One aggregate over the filtered rows, cached until the next write to
+    the model's table.
+    """
+    key = 'facets:{}:{}'.format(model.__tablename__, json.dumps(
+        [facets, build_tsquery(search_term)], sort_keys=True))
+
+    def build():
+        filters = facet_filters(model, facets)
+        tsquery = search_tsquery(search_term)
+        if tsquery is not None:
+            filters.append(model.search_vector.op('@@')(tsquery))
+        row = db.session.query(
+            func.count().label('total'),
+            *[func.count().filter(model.genres.any(genre)).label(genre)
+              for genre in GENRES]
+        ).filter(*filters).one()
+        return {
+            'total': row.total,
+            'genres': [{'name': genre, 'count': row._mapping[genre]}
+                       for genre in GENRES],
+        }
+
+    return cache.remember(key, build, tags=(model.__tablename__,),
+                          ttl=current_app.config['FACET_CACHE_TTL'])
+
+
+def facet_context(model, facets, search_term=''):
+    """Template variables for the facets panel."""
+    return {
+        'facets': facets,
+        'facet_counts': facet_counts(model, facets, search_term),
+        'states': STATES,
+        'matches': MATCHES,
+    }
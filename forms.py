@@ -1,10 +1,12 @@
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, URL, Optional, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, URL, Optional, Regexp, NumberRange, ValidationError
+from constants import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
 from enums import *
 
 phone_regexp_validator = Regexp("^[0-9]*$", message="Phone number should only contain digits")
+id_regexp_validator = Regexp("^[0-9]+$", message="Not a valid id.")
 
 
 def coerce_for_enum(target_enum):
@@ -22,16 +24,51 @@ def coerce_for_enum(target_enum):
 
 class ShowForm(Form):
     artist_id = StringField(
-        'artist_id'
+        'artist_id', validators=[DataRequired(), id_regexp_validator]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id', validators=[DataRequired(), id_regexp_validator]
     )
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION)],
+        # An empty value means the default duration, not no duration.
+        filters=[lambda value: DEFAULT_SHOW_DURATION if value is None
+                 else value],
+        default=DEFAULT_SHOW_DURATION
+    )
+
+
+class AvailabilityForm(Form):
+    class Meta:
+        # Submitted with GET, so results can be linked and paged.
+        csrf = False
+
+    state = SelectField(
+        'state', validators=[DataRequired()],
+        choices=State.choices(),
+        coerce=coerce_for_enum(State)
+    )
+    city = StringField(
+        'city', validators=[DataRequired()]
+    )
+    start = DateTimeField(
+        'start', validators=[DataRequired()],
+        format=['%Y-%m-%d %H:%M', '%Y-%m-%d']
+    )
+    end = DateTimeField(
+        'end', validators=[DataRequired()],
+        format=['%Y-%m-%d %H:%M', '%Y-%m-%d']
+    )
+
+    def validate_end(self, field):
+        if self.start.data and field.data <= self.start.data:
+            raise ValidationError('The end must be after the start.')
 
 
 class VenueForm(Form):
@@ -0,0 +1,368 @@
+import codecs
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+from wtforms.fields.core import UnboundField
+from wtforms.meta import DefaultMeta
+
+from areas import mark_areas_stale
+from autocomplete import mark_names_changed
+from bookings import VenueShows, booked_overlaps, show_end
+from cache import mark_stale
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+
+BATCH_SIZE = 5000
+
+FALSE_VALUES = {'', '0', 'f', 'false', 'n', 'no', 'off'}
+
+
+class ImportTarget:
+    def __init__(self, model, form_class, tags):
+        self.model = model
+        self.table = model.__table__
+        self.tags = tags
+        # The same fields the form class would bind, in declaration order.
+        unbound_fields = sorted(
+            ((name, value) for name, value in vars(form_class).items()
+             if isinstance(value, UnboundField)),
+            key=lambda item: item[1].creation_counter)
+        self.fields = {
+            name: unbound.bind(form=None, name=name, _meta=DefaultMeta())
+            for name, unbound in unbound_fields
+        }
+
+
+def venue_tags(rows):
+    return {'venues'}
+
+
+def artist_tags(rows):
+    return {'artists'}
+
+
+def show_tags(rows):
+    tags = {'shows', 'venues'}
+    for row in rows:
+        tags.add(f'venue:{row["venue_id"]}')
+        tags.add(f'artist:{row["artist_id"]}')
+    return tags
+
+
+def mark_imported_areas_stale(model, rows):
+    # COPY and executemany bypass the ORM hooks that refresh the
+    # /venues directory and the autocomplete names.
+    if model is Venue:
+        mark_areas_stale(db.session, areas={
+            (row['state'], row['city']) for row in rows})
+    elif model is Show:
+        mark_areas_stale(db.session,
+                         venue_ids={row['venue_id'] for row in rows})
+    if model is not Show:
+        # COPY returns no ids, so the whole index is rebuilt.
+        mark_names_changed(db.session, model.__tablename__, stale=True)
+
+
+TARGETS = {
+    'venues': lambda: ImportTarget(Venue, VenueForm, venue_tags),
+    'artists': lambda: ImportTarget(Artist, ArtistForm, artist_tags),
+    'shows': lambda: ImportTarget(Show, ShowForm, show_tags),
+}
+
+
+class BatchFailed(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.batches = []
+        self.errors = []
+        self.failed = None
+        self.last_line = 0
+
+    def as_dict(self):
+        return {
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'errors': [{'line': line, 'field': field, 'message': message}
+                       for line, field, message in self.errors],
+            'failed': self.failed,
+            'last_line': self.last_line,
+        }
+
+
+def detect_format(filename, content_type=None):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if content_type and 'ndjson' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, record if isinstance(record, dict) else None
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def text_stream(stream):
+    """Decode a binary stream lazily, one line at a time."""
+    return codecs.getreader('utf-8-sig')(stream)
+
+
+def form_values(field, value):
+    """Turn one input cell into the formdata list its form field expects."""
+    if value is None:
+        return ()
+    if field.type == 'SelectMultipleField':
+        if isinstance(value, str):
+            value = re.split(r'[,;]', value.strip('{}'))
+        return tuple(item.strip() for item in value if item.strip())
+    if field.type == 'BooleanField':
+        if isinstance(value, str):
+            value = value.strip().lower() not in FALSE_VALUES
+        return ('y',) if value else ()
+    if field.type == 'DateTimeField' and isinstance(value, str):
+        value = value.strip().replace('T', ' ', 1)
+    return (str(value),)
+
+
+def check_field(field, values):
+    # Runs the exact validator chain of the form field, so imports accept
+    # and reject the same values as the create forms do.
+    field.process(MultiDict([(field.name, value) for value in values]))
+    if field.validate(None):
+        return None, field.data
+    return field.errors[0], None
+
+
+def validate_batch(target, batch, report):
+    """Validate a batch column by column.
+
+    Each distinct value of a column is checked once, which matters for
+    columns such as state, city or genres that repeat across most rows.
+    """
+    errors = {}
+    columns = {}
+    for name, field in target.fields.items():
+        results = {}
+        column = []
+        for line, record in batch:
+            if record is None:
+                errors.setdefault(line, ('', 'Malformed record.'))
+                column.append(None)
+                continue
+            values = form_values(field, record.get(name))
+            if values not in results:
+                results[values] = check_field(field, values)
+            message, data = results[values]
+            if message is not None:
+                errors.setdefault(line, (name, message))
+            column.append(data)
+        columns[name] = column
+
+    if target.model is Show:
+        check_show_references(batch, columns, errors)
+        check_show_overlaps(batch, columns, errors)
+
+    rows = []
+    names = list(columns)
+    for index, (line, record) in enumerate(batch):
+        if line in errors:
+            report.errors.append((line, *errors[line]))
+            continue
+        rows.append({name: columns[name][index] for name in names})
+    report.rejected += len(batch) - len(rows)
+    return rows
+
+
+def check_show_references(batch, columns, errors):
+    for name, model in (('venue_id', Venue), ('artist_id', Artist)):
+        ids = {}
+        for index, value in enumerate(columns[name]):
+            try:
+                ids[index] = int(value)
+            except (TypeError, ValueError):
+                errors.setdefault(batch[index][0], (name, 'Not a valid id.'))
+        existing = {row.id for row in db.session.query(model.id).filter(
+            model.id.in_(set(ids.values())))} if ids else set()
+        for index, value in ids.items():
+            if value not in existing:
+                errors.setdefault(batch[index][0],
+                                  (name, f'{model.__name__} {value} does '
+                                         f'not exist.'))
+            columns[name][index] = value
+
+
+def check_show_overlaps(batch, columns, errors):
+    # Rejects the shows that overlap one at their venue, either already
+    # booked or on an earlier line, instead of failing the whole batch on
+    # the exclusion constraint. Other databases have no constraint.
+    shows = [
+        (line, columns['venue_id'][index], start,
+         show_end(start, columns['duration_minutes'][index]))
+        for index, ((line, _), start) in enumerate(
+            zip(batch, columns['start_time']))
+        if line not in errors]
+    booked = booked_overlaps(shows)
+    earlier = {}
+    for line, venue_id, start, end in shows:
+        if line in booked:
+            errors[line] = ('start_time', f'The venue is already booked '
+                                          f'then (show {booked[line]}).')
+            continue
+        venue_shows = earlier.setdefault(venue_id, VenueShows())
+        conflicts = venue_shows.overlapping(start, end)
+        if conflicts:
+            errors[line] = ('start_time', f'The venue is already booked '
+                                          f'then (line {conflicts[0][0]}).')
+            continue
+        venue_shows.add(line, start, end)
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, (list, tuple)):
+        value = '{' + ','.join(
+            '"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for item in value) + '}'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(table, rows):
+    names = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(row[name]) for name in names))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {table.name} ({", ".join(names)}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(table, rows):
+    db.session.execute(table.insert(), rows)
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        return json.load(checkpoint)['line']
+
+
+def write_checkpoint(path, line):
+    if not path:
+        return
+    with open(path + '.tmp', 'w') as checkpoint:
+        json.dump({'line': line}, checkpoint)
+    os.replace(path + '.tmp', path)
+
+
+def remove_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def import_records(kind, records, batch_size=BATCH_SIZE, method='auto',
+                   checkpoint=None, on_batch=None):
+    """Validate and load (line, record) pairs in committed batches.
+
+    Invalid rows, including shows that overlap one at their venue, are
+    rejected and reported; the rest of their batch is still loaded. A
+    batch that fails in the database is rolled back and stops the import;
+    the checkpoint then points at the last committed batch, so running
+    the import again resumes right after it. It is removed once every
+    batch is committed.
+    """
+    target = TARGETS[kind]()
+    if method == 'auto':
+        method = 'copy' if db.engine.dialect.name == 'postgresql' \
+            else 'executemany'
+    load = copy_rows if method == 'copy' else insert_rows
+
+    report = ImportReport()
+    report.last_line = resume_after = read_checkpoint(checkpoint)
+    batch = []
+
+    def flush():
+        first, last = batch[0][0], batch[-1][0]
+        rows = validate_batch(target, batch, report)
+        try:
+            if rows:
+                load(target.table, rows)
+                mark_stale(db.session, *target.tags(rows))
+                mark_imported_areas_stale(target.model, rows)
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            # Report the driver's message when there is one; errors raised
+            # by SQLAlchemy itself, e.g. InvalidRequestError, have no orig.
+            if getattr(error, 'orig', None) is not None:
+                error = error.orig
+            report.failed = {'first_line': first, 'last_line': last,
+                             'message': str(error).strip()}
+            raise BatchFailed()
+        report.inserted += len(rows)
+        report.last_line = last
+        report.batches.append({'first_line': first, 'last_line': last,
+                               'inserted': len(rows),
+                               'rejected': len(batch) - len(rows)})
+        write_checkpoint(checkpoint, last)
+        if on_batch is not None:
+            on_batch(report.batches[-1])
+
+    try:
+        for line, record in records:
+            if line <= resume_after:
+                continue
+            batch.append((line, record))
+            if len(batch) == batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+    except BatchFailed:
+        return report
+    # Finished: a later import of another file at the same path starts
+    # from its first line.
+    remove_checkpoint(checkpoint)
+    return report
+
+
+def import_stream(kind, stream, fmt, **options):
+    return import_records(kind, READERS[fmt](stream), **options)
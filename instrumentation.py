@@ -0,0 +1,269 @@
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import jinja2
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self.profiler = None
+
+
+class Metrics:
+    """Process-wide counters rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.buckets = defaultdict(int)
+        self.collectors = []
+
+    def inc(self, name, labels, value=1.0):
+        with self.lock:
+            self.counters[name, labels] += value
+
+    def observe(self, name, labels, seconds):
+        with self.lock:
+            self.counters[name + '_sum', labels] += seconds
+            self.counters[name + '_count', labels] += 1
+            # Every bucket is exported, the empty ones too.
+            for bound in DURATION_BUCKETS:
+                self.buckets[name, labels, bound] += seconds <= bound
+            self.buckets[name, labels, '+Inf'] += 1
+
+    def render(self):
+        with self.lock:
+            samples = sorted(self.counters.items())
+            buckets = sorted(self.buckets.items(), key=lambda item: (
+                item[0][0], item[0][1], float(item[0][2])))
+        histograms = {name for (name, _, _), _ in buckets}
+
+        # Every line of a metric family follows its # TYPE line, so the
+        # _sum and _count samples of a histogram go with its buckets.
+        families = defaultdict(list)
+        for (name, labels, bound), value in buckets:
+            bucket_labels = labels + (('le', str(bound)),)
+            families[name].append(
+                f'{name}_bucket{format_labels(bucket_labels)} {value}')
+        for (name, labels), value in samples:
+            family = name.rsplit('_', 1)[0]
+            if family not in histograms:
+                family = name
+            families[family].append(f'{name}{format_labels(labels)} '
+                                    f'{value:g}')
+
+        lines = []
+        for family, family_lines in families.items():
+            kind = 'histogram' if family in histograms else 'counter'
+            lines.append(f'# TYPE {family} {kind}')
+            lines.extend(family_lines)
+        for collect in self.collectors:
+            for name, labels, value in collect():
+                lines.append(f'{name}{format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{value}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def statement_shape(statement):
+    # Bound parameters are already placeholders; collapse IN lists and
+    # whitespace so the same query with different ids counts as one shape.
+    statement = re.sub(r'\(\s*(%\([^)]+\)s|\?)(\s*,\s*(%\([^)]+\)s|\?))*\s*\)',
+                       '(?)', statement)
+    return ' '.join(statement.split())
+
+
+class TimedTemplate(jinja2.Template):
+    """Template that adds its render time, minus SQL time, to the request."""
+
+    def render(self, *args, **kwargs):
+        if not has_request_context() or 'request_stats' not in g:
+            return super().render(*args, **kwargs)
+        stats = g.request_stats
+        started, sql_time = time.perf_counter(), stats.sql_time
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.template_time += (time.perf_counter() - started
+                                    - (stats.sql_time - sql_time))
+
+    def generate(self, *args, **kwargs):
+        stats = g.get('request_stats') if has_request_context() else None
+        chunks = super().generate(*args, **kwargs)
+        if stats is None:
+            yield from chunks
+            return
+        while True:
+            started, sql_time = time.perf_counter(), stats.sql_time
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                stats.template_time += (time.perf_counter() - started
+                                        - (stats.sql_time - sql_time))
+            yield chunk
+
+
+POOL_EVENTS = {
+    'connect': 'fyyur_db_pool_connections_total',
+    'checkout': 'fyyur_db_pool_checkouts_total',
+    'invalidate': 'fyyur_db_pool_invalidations_total',
+}
+
+
+def pool_status(pool, max_overflow):
+    """Gauges for a QueuePool; pools without a fixed size report none."""
+    if not hasattr(pool, 'checkedout'):
+        return []
+    capacity = pool.size() + max(max_overflow, 0)
+    return [
+        ('fyyur_db_pool_size', (), pool.size()),
+        ('fyyur_db_pool_capacity', (), capacity),
+        ('fyyur_db_pool_checked_out', (), pool.checkedout()),
+        ('fyyur_db_pool_checked_in', (), pool.checkedin()),
+        ('fyyur_db_pool_overflow', (), max(pool.overflow(), 0)),
+        ('fyyur_db_pool_utilisation', (),
+         pool.checkedout() / capacity if capacity else 0),
+    ]
+
+
+class Instrumentation:
+    def __init__(self):
+        self.metrics = Metrics()
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule('/__metrics', 'metrics', self.metrics_view)
+        event.listen(Engine, 'before_cursor_execute', self.before_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_execute)
+        for name, metric in POOL_EVENTS.items():
+            event.listen(Pool, name, self.pool_event_counter(metric))
+        app.extensions['instrumentation'] = self
+
+    def start_request(self):
+        stats = g.request_stats = RequestStats()
+        sample_rate = self.app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        if sample_rate and random.random() < sample_rate:
+            stats.profiler = cProfile.Profile()
+            stats.profiler.enable()
+
+    def finish_request(self, response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        labels = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+        }
+        # Streamed bodies are rendered after this hook, so the numbers are
+        # recorded once the server has closed the response.
+        response.call_on_close(lambda: self.record(stats, labels))
+        return response
+
+    def record(self, stats, labels):
+        duration = time.perf_counter() - stats.started
+        endpoint = (('endpoint', labels['endpoint']),)
+        threshold = self.app.config.get('SQL_REPEAT_THRESHOLD', 10)
+        repeated = {shape: count for shape, count in stats.statements.items()
+                    if count > threshold}
+
+        self.metrics.inc('fyyur_requests_total', endpoint + (
+            ('method', labels['method']), ('status', labels['status'])))
+        self.metrics.observe('fyyur_request_duration_seconds', endpoint,
+                             duration)
+        self.metrics.inc('fyyur_db_statements_total', endpoint,
+                         stats.sql_count)
+        self.metrics.inc('fyyur_db_duration_seconds_total', endpoint,
+                         stats.sql_time)
+        self.metrics.inc('fyyur_template_duration_seconds_total', endpoint,
+                         stats.template_time)
+        if repeated:
+            self.metrics.inc('fyyur_repeated_statements_total', endpoint,
+                             len(repeated))
+
+        self.app.logger.info(json.dumps({
+            'event': 'request',
+            **labels,
+            'duration_ms': round(duration * 1000, 2),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+        }))
+        for shape, count in repeated.items():
+            self.app.logger.warning(json.dumps({
+                'event': 'repeated_statement',
+                'endpoint': labels['endpoint'],
+                'count': count,
+                'statement': shape,
+            }))
+
+        if stats.profiler is not None:
+            stats.profiler.disable()
+            profile_dir = self.app.config.get('PROFILE_DIR', 'profiles')
+            os.makedirs(profile_dir, exist_ok=True)
+            stats.profiler.dump_stats(os.path.join(
+                profile_dir,
+                f'{labels["endpoint"]}-{time.strftime("%Y%m%d%H%M%S")}-'
+                f'{os.getpid()}-{random.randrange(1 << 16):04x}.prof'))
+
+    def before_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        # Kept on the execution context, which is discarded with the
+        # statement whether or not it raises. Statements the engine runs
+        # without a context are not timed.
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    def after_execute(self, conn, cursor, statement, parameters, context,
+                      executemany):
+        started = getattr(context, 'query_started', None)
+        if started is None or not has_request_context() or \
+                'request_stats' not in g:
+            return
+        elapsed = time.perf_counter() - started
+        stats = g.request_stats
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+        stats.statements[statement_shape(statement)] += 1
+
+    def pool_event_counter(self, metric):
+        def count(*args):
+            self.metrics.inc(metric, ())
+        return count
+
+    def metrics_view(self):
+        return Response(self.metrics.render(),
+                        mimetype='text/plain; version=0.0.4')
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,59 @@
+"""add show durations and forbid overlapping shows at a venue
+
+Revision ID: a4e61b9c7d20
+Revises: f3c8a1d6e2b7
+Create Date: 2026-10-18 21:37:02.664813
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e61b9c7d20'
+down_revision = 'f3c8a1d6e2b7'
+branch_labels = None
+depends_on = None
+
+DEFAULT_DURATION = 120
+
+# Existing shows get the default duration, cut short where the next show
+# at the same venue starts earlier, so the constraint below holds for
+# them. Two shows starting at the same time leave the first with an
+# empty period, which never conflicts.
+CLIP_DURATIONS = f"""
+UPDATE shows s SET duration_minutes = floor(
+    extract(epoch FROM n.next_start - s.start_time) / 60)::integer
+FROM (
+    SELECT id, lead(start_time) OVER (
+        PARTITION BY venue_id ORDER BY start_time, id) AS next_start
+    FROM shows
+) n
+WHERE n.id = s.id
+  AND n.next_start < s.start_time + interval '{DEFAULT_DURATION} minutes'
+"""
+
+NO_OVERLAP = """
+ALTER TABLE shows ADD CONSTRAINT shows_venue_no_overlap EXCLUDE USING gist (
+    venue_id WITH =,
+    tsrange(start_time, start_time + duration_minutes * interval '1 minute')
+        WITH &&
+)
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('shows', sa.Column(
+        'duration_minutes', sa.Integer(), nullable=False,
+        server_default=str(DEFAULT_DURATION)))
+    op.create_check_constraint('ck_shows_duration_minutes', 'shows',
+                               'duration_minutes >= 0')
+    op.execute(CLIP_DURATIONS)
+    op.execute(NO_OVERLAP)
+
+
+def downgrade():
+    op.drop_constraint('shows_venue_no_overlap', 'shows', type_='exclude')
+    op.drop_constraint('ck_shows_duration_minutes', 'shows', type_='check')
+    op.drop_column('shows', 'duration_minutes')
@@ -0,0 +1,30 @@
+"""add genre and area indexes for faceted browsing
+
+Revision ID: b5d20e8f4a17
+Revises: a4e61b9c7d20
+Create Date: 2026-10-18 23:05:48.210394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d20e8f4a17'
+down_revision = 'a4e61b9c7d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.create_index(f'ix_{table}_genres', table, ['genres'],
+                        unique=False, postgresql_using='gin')
+    op.create_index('ix_artists_state_city', 'artists', ['state', 'city'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artists_state_city', table_name='artists')
+    for table in ('artists', 'venues'):
+        op.drop_index(f'ix_{table}_genres', table_name=table)
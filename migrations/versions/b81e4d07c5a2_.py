@@ -0,0 +1,58 @@
+"""add full-text search vectors to venues and artists
+
+Revision ID: b81e4d07c5a2
+Revises: 6f2a9c41d8b3
+Create Date: 2026-10-18 11:47:05.118964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e4d07c5a2'
+down_revision = '6f2a9c41d8b3'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.state, '')), 'C') ||
+        setweight(to_tsvector('simple',
+            array_to_string(coalesce(NEW.genres, '{}'), ' ')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER {table}_search_vector_update
+BEFORE INSERT OR UPDATE OF name, city, state, genres ON {table}
+FOR EACH ROW EXECUTE PROCEDURE search_vector_update()
+"""
+
+
+def upgrade():
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(),
+                                       nullable=True))
+        op.execute(SEARCH_VECTOR_TRIGGER.format(table=table))
+        # Fire the trigger once for every existing row.
+        op.execute(f'UPDATE {table} SET name = name')
+        op.create_index(f'ix_{table}_search_vector', table,
+                        ['search_vector'], unique=False,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('artists', 'venues'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.execute(f'DROP TRIGGER {table}_search_vector_update ON {table}')
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION search_vector_update()')
@@ -0,0 +1,129 @@
+"""add upcoming and past show counters to venues and artists
+
+Revision ID: c4f19a7d2e60
+Revises: b81e4d07c5a2
+Create Date: 2026-10-18 14:02:51.730226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f19a7d2e60'
+down_revision = 'b81e4d07c5a2'
+branch_labels = None
+depends_on = None
+
+# Shows are counted as upcoming when they start after the last roll-over
+# (show_counters_rollover.rolled_at) and as past otherwise. The triggers
+# are statement level with transition tables, so a COPY or executemany
+# of thousands of shows updates each venue and artist row once.
+CHANGES = {
+    'insert': "SELECT venue_id, artist_id, start_time, 1 AS delta "
+              "FROM new_shows",
+    'delete': "SELECT venue_id, artist_id, start_time, -1 AS delta "
+              "FROM old_shows",
+    'update': "SELECT venue_id, artist_id, start_time, 1 AS delta "
+              "FROM new_shows UNION ALL "
+              "SELECT venue_id, artist_id, start_time, -1 AS delta "
+              "FROM old_shows",
+}
+
+APPLY_CHANGES = """
+    UPDATE {table} t SET
+        upcoming_shows_count = t.upcoming_shows_count + c.upcoming,
+        past_shows_count = t.past_shows_count + c.past
+    FROM (
+        SELECT {owner} AS id,
+               coalesce(sum(delta) FILTER (WHERE start_time > cutoff), 0)
+                   AS upcoming,
+               coalesce(sum(delta) FILTER (WHERE start_time <= cutoff), 0)
+                   AS past
+        FROM ({changes}) AS changes
+        GROUP BY {owner}
+    ) c
+    WHERE t.id = c.id AND (c.upcoming <> 0 OR c.past <> 0);
+"""
+
+COUNTERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counters_{event}() RETURNS trigger AS $$
+DECLARE
+    cutoff timestamp;
+BEGIN
+    -- FOR SHARE waits for a running roll-over to commit, so the shows
+    -- are classified against the cutoff it leaves behind.
+    SELECT rolled_at INTO cutoff FROM show_counters_rollover FOR SHARE;
+    {venues}
+    {artists}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+COUNTERS_TRIGGER = """
+CREATE TRIGGER shows_counters_{event}
+AFTER {event} ON shows
+REFERENCING {tables}
+FOR EACH STATEMENT EXECUTE PROCEDURE show_counters_{event}()
+"""
+
+TRANSITION_TABLES = {
+    'insert': 'NEW TABLE AS new_shows',
+    'delete': 'OLD TABLE AS old_shows',
+    'update': 'OLD TABLE AS old_shows NEW TABLE AS new_shows',
+}
+
+BACKFILL = """
+UPDATE {table} t SET
+    upcoming_shows_count = c.upcoming,
+    past_shows_count = c.past
+FROM (
+    SELECT {owner} AS id,
+           count(*) FILTER (WHERE start_time > r.rolled_at) AS upcoming,
+           count(*) FILTER (WHERE start_time <= r.rolled_at) AS past
+    FROM shows, show_counters_rollover r
+    GROUP BY {owner}
+) c
+WHERE t.id = c.id
+"""
+
+
+def upgrade():
+    op.create_table(
+        'show_counters_rollover',
+        sa.Column('id', sa.Boolean(), server_default=sa.true(),
+                  nullable=False),
+        sa.Column('rolled_at', sa.DateTime(), nullable=False),
+        sa.CheckConstraint('id', name='ck_show_counters_rollover_single'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO show_counters_rollover (rolled_at) '
+               'VALUES (LOCALTIMESTAMP)')
+
+    for table, owner in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.execute(BACKFILL.format(table=table, owner=owner))
+
+    for event, changes in CHANGES.items():
+        op.execute(COUNTERS_FUNCTION.format(
+            event=event,
+            venues=APPLY_CHANGES.format(table='venues', owner='venue_id',
+                                        changes=changes),
+            artists=APPLY_CHANGES.format(table='artists', owner='artist_id',
+                                         changes=changes)))
+        op.execute(COUNTERS_TRIGGER.format(
+            event=event, tables=TRANSITION_TABLES[event]))
+
+
+def downgrade():
+    for event in CHANGES:
+        op.execute(f'DROP TRIGGER shows_counters_{event} ON shows')
+        op.execute(f'DROP FUNCTION show_counters_{event}()')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('show_counters_rollover')
@@ -0,0 +1,56 @@
+"""stamp updated_at when rows change and count their versions
+
+Revision ID: c7e3a9f1d2b6
+Revises: b5d20e8f4a17
+Create Date: 2026-10-19 09:12:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e3a9f1d2b6'
+down_revision = 'b5d20e8f4a17'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+# LOCALTIMESTAMP is the start of the transaction, so a long one, e.g. an
+# import, stamped its rows earlier than shorter ones committed before it.
+# clock_timestamp() narrows that to the time the row is written, which is
+# still before the commit; row_version counts every change, so page
+# versions built from it move whatever order transactions commit in.
+SET_UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW IS DISTINCT FROM OLD THEN
+        NEW.updated_at := {now};
+        {bump_version}
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'row_version', sa.Integer(), nullable=False,
+            server_default='1'))
+        op.alter_column(table, 'updated_at',
+                        server_default=sa.text('clock_timestamp()'))
+    op.execute(SET_UPDATED_AT_FUNCTION.format(
+        now='clock_timestamp()',
+        bump_version='NEW.row_version := OLD.row_version + 1;'))
+
+
+def downgrade():
+    op.execute(SET_UPDATED_AT_FUNCTION.format(
+        now='LOCALTIMESTAMP', bump_version=''))
+    for table in TABLES:
+        op.alter_column(table, 'updated_at',
+                        server_default=sa.text('LOCALTIMESTAMP'))
+        op.drop_column(table, 'row_version')
@@ -0,0 +1,44 @@
+"""add the venue_areas directory table
+
+Revision ID: d8a35f0b1c94
+Revises: c4f19a7d2e60
+Create Date: 2026-10-18 16:40:12.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a35f0b1c94'
+down_revision = 'c4f19a7d2e60'
+branch_labels = None
+depends_on = None
+
+BACKFILL = """
+INSERT INTO venue_areas (state, city, venues)
+SELECT state, city,
+       jsonb_agg(jsonb_build_object(
+           'id', id,
+           'name', name,
+           'num_upcoming_shows', upcoming_shows_count) ORDER BY name, id)
+FROM venues
+GROUP BY state, city
+"""
+
+
+def upgrade():
+    op.create_table(
+        'venue_areas',
+        sa.Column('state', sa.String(length=120), nullable=False),
+        sa.Column('city', sa.String(length=120), nullable=False),
+        sa.Column('venues', postgresql.JSONB(astext_type=sa.Text()),
+                  nullable=False),
+        sa.PrimaryKeyConstraint('state', 'city')
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    op.drop_table('venue_areas')
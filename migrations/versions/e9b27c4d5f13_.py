@@ -0,0 +1,57 @@
+"""add updated_at to venues, artists and shows
+
+Revision ID: e9b27c4d5f13
+Revises: d8a35f0b1c94
+Create Date: 2026-10-18 18:05:37.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b27c4d5f13'
+down_revision = 'd8a35f0b1c94'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+# A trigger rather than an ORM onupdate, so COPY imports, bulk UPDATEs and
+# the show counter triggers bump it as well. Updates that change nothing
+# keep the old value, so they do not invalidate cached pages.
+SET_UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF NEW IS DISTINCT FROM OLD THEN
+        NEW.updated_at := LOCALTIMESTAMP;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SET_UPDATED_AT_TRIGGER = """
+CREATE TRIGGER {table}_set_updated_at
+BEFORE UPDATE ON {table}
+FOR EACH ROW EXECUTE PROCEDURE set_updated_at()
+"""
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text('LOCALTIMESTAMP')))
+
+    op.execute(SET_UPDATED_AT_FUNCTION)
+    for table in TABLES:
+        op.execute(SET_UPDATED_AT_TRIGGER.format(table=table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_set_updated_at ON {table}')
+    op.execute('DROP FUNCTION set_updated_at()')
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
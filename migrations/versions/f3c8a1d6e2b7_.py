@@ -0,0 +1,35 @@
+"""cascade deletes of venues and artists to their shows
+
+Revision ID: f3c8a1d6e2b7
+Revises: e9b27c4d5f13
+Create Date: 2026-10-18 20:11:48.392615
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d6e2b7'
+down_revision = 'e9b27c4d5f13'
+branch_labels = None
+depends_on = None
+
+# The constraints were created unnamed, so they carry PostgreSQL's
+# default names.
+FOREIGN_KEYS = (
+    ('shows_venue_id_fkey', 'venue_id', 'venues'),
+    ('shows_artist_id_fkey', 'artist_id', 'artists'),
+)
+
+
+def upgrade():
+    for name, column, table in FOREIGN_KEYS:
+        op.drop_constraint(name, 'shows', type_='foreignkey')
+        op.create_foreign_key(name, 'shows', table, [column], ['id'],
+                              ondelete='CASCADE')
+
+
+def downgrade():
+    for name, column, table in FOREIGN_KEYS:
+        op.drop_constraint(name, 'shows', type_='foreignkey')
+        op.create_foreign_key(name, 'shows', table, [column], ['id'])
@@ -1,12 +1,44 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 
-from constants import STRFTIME_FORMAT
+from constants import DEFAULT_SHOW_DURATION
+from routing import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+
+db = RoutingSQLAlchemy()
+
+
+class UnplannedLazyLoadError(Exception):
+    pass
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def guard_lazy_loads(orm_execute_state):
+    # Relationships are loaded per endpoint with explicit loader options.
+    # With SQLALCHEMY_RAISE_ON_LAZY_LOAD enabled (e.g. in tests) any
+    # attribute access that falls back to a lazy load fails loudly.
+    if not orm_execute_state.is_select or not has_app_context():
+        return
+    state = orm_execute_state.lazy_loaded_from
+    if state is None:
+        return
+    if current_app.config.get('SQLALCHEMY_RAISE_ON_LAZY_LOAD'):
+        raise UnplannedLazyLoadError(
+            f'Unplanned lazy load from {state.class_.__name__} '
+            f'(identity {state.identity})')
 
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city', 'state', 'city'),
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -20,13 +52,39 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean(), nullable=False)
     seeking_description = db.Column(db.String(500), nullable=True)
+    # Maintained by the search_vector_update trigger, see migrations.
+    search_vector = db.deferred(db.Column(
+        TSVECTOR, server_default=db.FetchedValue(),
+        server_onupdate=db.FetchedValue()))
+    # Maintained by the shows_counters_* triggers and the counter roll-over,
+    # see counters.py.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 server_default='0')
+    # Maintained by the set_updated_at trigger, see migrations.
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           server_default=db.func.clock_timestamp(),
+                           server_onupdate=db.FetchedValue())
+    row_version = db.Column(db.Integer, nullable=False, server_default='1',
+                            server_onupdate=db.FetchedValue())
 
-    shows = db.relationship('Show', backref='venue', lazy='joined',
-                            cascade="all, delete")
+    # Shows are deleted by the ON DELETE CASCADE foreign key, not loaded
+    # and deleted one by one.
+    shows = db.relationship('Show', backref='venue', lazy='select',
+                            cascade="all, delete", passive_deletes=True)
 
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artists_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -39,27 +97,70 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120), nullable=True)
     seeking_venue = db.Column(db.Boolean(), nullable=False)
     seeking_description = db.Column(db.String(500), nullable=True)
+    # Maintained by the search_vector_update trigger, see migrations.
+    search_vector = db.deferred(db.Column(
+        TSVECTOR, server_default=db.FetchedValue(),
+        server_onupdate=db.FetchedValue()))
+    # Maintained by the shows_counters_* triggers and the counter roll-over,
+    # see counters.py.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False,
+                                 server_default='0')
+    # Maintained by the set_updated_at trigger, see migrations.
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           server_default=db.func.clock_timestamp(),
+                           server_onupdate=db.FetchedValue())
+    row_version = db.Column(db.Integer, nullable=False, server_default='1',
+                            server_onupdate=db.FetchedValue())
 
-    shows = db.relationship('Show', backref='artist', lazy='joined',
-                            cascade="all, delete")
+    # Shows are deleted by the ON DELETE CASCADE foreign key, not loaded
+    # and deleted one by one.
+    shows = db.relationship('Show', backref='artist', lazy='select',
+                            cascade="all, delete", passive_deletes=True)
+
+
+# Single row holding the moment up to which shows count as past in the
+# upcoming_shows_count/past_shows_count columns.
+show_counters_rollover = db.Table(
+    'show_counters_rollover',
+    db.Column('id', db.Boolean, primary_key=True, server_default=db.true()),
+    db.Column('rolled_at', db.DateTime, nullable=False),
+    db.CheckConstraint('id', name='ck_show_counters_rollover_single'),
+)
+
+
+# The /venues directory: one row per (state, city) with the venues there as
+# a JSON array of {id, name, num_upcoming_shows}, kept current by areas.py.
+venue_areas = db.Table(
+    'venue_areas',
+    db.Column('state', db.String(120), primary_key=True),
+    db.Column('city', db.String(120), primary_key=True),
+    db.Column('venues', JSONB, nullable=False),
+)
 
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'))
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id',
+                                                    ondelete='CASCADE'))
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id',
+                                                   ondelete='CASCADE'))
     start_time = db.Column(db.DateTime, nullable=False)
-
-    def format(self):
-        return {
-            'id': self.id,
-            'artist_id': self.artist_id,
-            'artist_name': self.artist.name,
-            'venue_id': self.venue_id,
-            'venue_name': self.venue.name,
-            'venue_image_link': self.venue.image_link,
-            'artist_image_link': self.artist.image_link,
-            'start_time': self.start_time.strftime(STRFTIME_FORMAT)
-        }
+    # Shows at one venue may not overlap: the shows_venue_no_overlap
+    # exclusion constraint enforces it on PostgreSQL, see bookings.py.
+    duration_minutes = db.Column(db.Integer, nullable=False,
+                                 server_default=str(DEFAULT_SHOW_DURATION))
+    # Maintained by the set_updated_at trigger, see migrations.
+    updated_at = db.Column(db.DateTime, nullable=False,
+                           server_default=db.func.clock_timestamp(),
+                           server_onupdate=db.FetchedValue())
+    row_version = db.Column(db.Integer, nullable=False, server_default='1',
+                            server_onupdate=db.FetchedValue())
@@ -0,0 +1,183 @@
+import math
+import random
+import threading
+import time
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm, text
+from sqlalchemy.pool import NullPool
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# A replica that has replayed everything it received is current however
+# long ago the primary last committed; the replay timestamp only measures
+# lag while WAL is waiting to be applied.
+REPLICA_LAG_QUERY = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM now() - '
+    'pg_last_xact_replay_timestamp()), 0) END')
+
+
+def read_only(view):
+    """Let a view that is not a GET, e.g. a search form, use the replicas."""
+    view.read_only = True
+    return view
+
+
+class ReplicaHealth:
+    """Replication lag per replica bind, refreshed every interval.
+
+    Replicas that lag more than DB_REPLICA_MAX_LAG seconds, or do not
+    answer within DB_REPLICA_CHECK_TIMEOUT, are skipped until the next
+    check. Checks run in a background thread, so requests never wait for
+    a replica that is down: they use the replicas the last check found
+    healthy, and the primary until the first check is done.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = float('-inf')
+        self.checking = None
+        self.healthy = ()
+        # bind -> engine used only for checks, with short timeouts
+        self.probes = {}
+
+    def healthy_binds(self, db, app):
+        interval = app.config['DB_REPLICA_CHECK_INTERVAL']
+        if time.monotonic() - self.checked_at < interval:
+            return self.healthy
+        with self.lock:
+            if self.checking is None and \
+                    time.monotonic() - self.checked_at >= interval:
+                self.checking = threading.Thread(
+                    target=self.check, args=(db, app), daemon=True,
+                    name='replica-health')
+                self.checking.start()
+        return self.healthy
+
+    def check(self, db, app):
+        try:
+            self.healthy = tuple(
+                bind for bind in app.config['DB_REPLICA_BINDS']
+                if self.lag(app, self.probe(db, app, bind))
+                <= app.config['DB_REPLICA_MAX_LAG'])
+        except Exception:
+            app.logger.exception('Checking the replicas failed')
+        finally:
+            with self.lock:
+                self.checked_at = time.monotonic()
+                self.checking = None
+
+    def probe(self, db, app, bind):
+        engine = self.probes.get(bind)
+        if engine is None:
+            url = db.get_engine(app, bind=bind).url
+            timeout = app.config['DB_REPLICA_CHECK_TIMEOUT']
+            connect_args = {}
+            if url.get_backend_name() == 'postgresql':
+                connect_args = {
+                    'connect_timeout': math.ceil(timeout),
+                    'options': f'-c statement_timeout={int(timeout * 1000)}',
+                }
+            engine = self.probes[bind] = create_engine(
+                url, poolclass=NullPool, connect_args=connect_args)
+        return engine
+
+    def lag(self, app, engine):
+        if engine.dialect.name != 'postgresql':
+            return 0
+        try:
+            with engine.connect() as connection:
+                return float(connection.execute(REPLICA_LAG_QUERY).scalar())
+        except Exception:
+            app.logger.warning('Replica %s is unreachable', engine.url.host)
+            return float('inf')
+
+
+replica_health = ReplicaHealth()
+
+
+class RoutingSession(SignallingSession):
+    """Sends the reads of read-only requests to a replica.
+
+    Everything else uses the primary: flushes, DML, SELECT ... FOR UPDATE,
+    work outside a request (CLI commands), non-GET requests, and every
+    statement of a request after it wrote, so it reads its own writes.
+    A client that wrote recently carries a cookie that keeps its reads
+    on the primary for DB_REPLICA_LAG_TOLERANCE seconds.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause)
+        if not self.app.config['DB_REPLICA_BINDS']:
+            return primary
+        if self._flushing or not is_read(clause):
+            self.info['wrote'] = True
+            return primary
+        if (not read_only_request(self.app) or self.info.get('wrote')
+                or sticky_to_primary(self.app)):
+            return primary
+
+        if 'replica' not in self.info:
+            healthy = replica_health.healthy_binds(self.db, self.app)
+            self.info['replica'] = random.choice(healthy) if healthy else None
+        if self.info['replica'] is None:
+            return primary
+        return self.db.get_engine(self.app, bind=self.info['replica'])
+
+
+def is_read(clause):
+    if clause is None:
+        return True
+    return (getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None)
+
+
+def read_only_request(app):
+    if not has_request_context():
+        return False
+    view = app.view_functions.get(request.endpoint)
+    return request.method in READ_METHODS or getattr(
+        view, 'read_only', False)
+
+
+def sticky_to_primary(app):
+    cookie = request.cookies.get(app.config['DB_REPLICA_STICKY_COOKIE'])
+    try:
+        return cookie is not None and float(cookie) > time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('DB_REPLICA_BINDS', ())
+        if app.config['DB_REPLICA_BINDS'] and \
+                app.config['DB_REPLICA_LAG_TOLERANCE'] < \
+                app.config['DB_REPLICA_MAX_LAG']:
+            # A client could be sent to a replica that has not replayed
+            # its write yet.
+            raise ValueError('DB_REPLICA_LAG_TOLERANCE must be at least '
+                             'DB_REPLICA_MAX_LAG.')
+        app.after_request(self.stick_to_primary)
+
+    def stick_to_primary(self, response):
+        # The session is only looked at if the request created one.
+        if not self.session.registry.has():
+            return response
+        config = current_app.config
+        if config['DB_REPLICA_BINDS'] and self.session.info.get('wrote'):
+            tolerance = config['DB_REPLICA_LAG_TOLERANCE']
+            response.set_cookie(config['DB_REPLICA_STICKY_COOKIE'],
+                                str(time.time() + tolerance),
+                                max_age=math.ceil(tolerance), httponly=True)
+        return response
@@ -0,0 +1,56 @@
+import re
+
+from sqlalchemy import func
+
+from constants import SEARCH_PAGE_SIZE
+from models import db
+
+SEARCH_CONFIG = 'simple'
+
+
+def build_tsquery(search_term):
+    # Every word of the term has to match as a prefix, so "jazz sa" finds
+    # "The Jazz Saloon" in San Francisco.
+    words = re.findall(r'[^\W_]+', search_term.lower())
+    if not words:
+        return None
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_tsquery(search_term):
+    tsquery = build_tsquery(search_term)
+    if tsquery is None:
+        return None
+    return func.to_tsquery(SEARCH_CONFIG, tsquery)
+
+
+def search_entities(model, search_term, page=1, limit=SEARCH_PAGE_SIZE,
+                    filters=()):
+    query = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(*filters)
+    count_query = db.session.query(func.count(model.id)).filter(*filters)
+
+    tsquery = search_tsquery(search_term)
+    if tsquery is None:
+        query = query.order_by(model.name, model.id)
+    else:
+        matches = model.search_vector.op('@@')(tsquery)
+        query = query.filter(matches).order_by(
+            func.ts_rank(model.search_vector, tsquery).desc(),
+            model.name,
+            model.id
+        )
+        count_query = count_query.filter(matches)
+
+    rows = query.limit(limit).offset((page - 1) * limit).all()
+    count = count_query.scalar()
+
+    return {
+        "count": count,
+        "page": page,
+        "pages": max((count + limit - 1) // limit, 1),
+        "data": [row._asdict() for row in rows]
+    }
@@ -0,0 +1,154 @@
+import random
+from datetime import datetime, timedelta
+
+from areas import rebuild_venue_areas
+from constants import DEFAULT_SHOW_DURATION
+from enums import Genre, State
+from models import db, Venue, Artist, Show
+
+# A few real cities for the busiest states; the rest get generic names.
+CITIES = {
+    'CA': ['San Francisco', 'Los Angeles', 'San Diego', 'Oakland'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo'],
+    'TX': ['Austin', 'Houston', 'Dallas'],
+    'TN': ['Nashville', 'Memphis'],
+    'IL': ['Chicago'],
+    'LA': ['New Orleans'],
+    'WA': ['Seattle'],
+    'GA': ['Atlanta'],
+    'CO': ['Denver'],
+    'OR': ['Portland'],
+}
+GENERIC_CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville']
+
+NAME_PARTS = (
+    ['The', 'Blue', 'Old', 'Grand', 'Little', 'Velvet', 'Electric', 'Golden'],
+    ['Jazz', 'Rock', 'Moon', 'River', 'Fox', 'Echo', 'Crown', 'Owl'],
+)
+VENUE_SUFFIXES = ['Hall', 'Club', 'Saloon', 'Lounge', 'Theatre', 'Room']
+ARTIST_SUFFIXES = ['Band', 'Trio', 'Collective', 'Orchestra', 'Project']
+
+BATCH_SIZE = 5000
+
+SHOW_DAYS = range(-730, 366)
+SHOW_HOURS = tuple(range(18, 24, DEFAULT_SHOW_DURATION // 60))
+
+
+def weighted_states(rng):
+    # States with named cities host most of the scene.
+    states = [state.value for state in State]
+    weights = [12 if state in CITIES else 1 for state in states]
+    return lambda: rng.choices(states, weights)[0]
+
+
+def pick_city(rng, state):
+    return rng.choice(CITIES.get(state, GENERIC_CITIES))
+
+
+def pick_genres(rng):
+    genres = [genre.value for genre in Genre]
+    return rng.sample(genres, rng.choice((1, 1, 2, 3)))
+
+
+def pick_name(rng, suffixes, number):
+    first, second = NAME_PARTS
+    return (f'{rng.choice(first)} {rng.choice(second)} '
+            f'{rng.choice(suffixes)} {number}')
+
+
+def venue_rows(rng, count):
+    pick_state = weighted_states(rng)
+    for number in range(1, count + 1):
+        state = pick_state()
+        yield {
+            'name': pick_name(rng, VENUE_SUFFIXES, number),
+            'genres': pick_genres(rng),
+            'city': pick_city(rng, state),
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} Main Street',
+            'phone': f'{rng.randint(2000000000, 9999999999)}',
+            'image_link': f'https://images.example.com/venues/{number}.jpg',
+            'website_link': f'https://venue{number}.example.com',
+            'facebook_link': f'https://www.facebook.com/venue{number}',
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': None,
+        }
+
+
+def artist_rows(rng, count):
+    pick_state = weighted_states(rng)
+    for number in range(1, count + 1):
+        state = pick_state()
+        yield {
+            'name': pick_name(rng, ARTIST_SUFFIXES, number),
+            'genres': pick_genres(rng),
+            'city': pick_city(rng, state),
+            'state': state,
+            'phone': f'{rng.randint(2000000000, 9999999999)}',
+            'image_link': f'https://images.example.com/artists/{number}.jpg',
+            'website_link': None,
+            'facebook_link': f'https://www.facebook.com/artist{number}',
+            'seeking_venue': rng.random() < 0.4,
+            'seeking_description': None,
+        }
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now):
+    # Two thirds of the shows are in the past, the rest up to a year ahead,
+    # all starting on the hour in the evening. Each venue books a slot at
+    # most once and slots are a default show length apart, so the shows
+    # satisfy the shows_venue_no_overlap constraint.
+    slots = len(SHOW_DAYS) * len(SHOW_HOURS)
+    if count > slots * len(venue_ids):
+        raise ValueError(f'{len(venue_ids)} venues cannot host {count} shows')
+    booked = {}
+    while count:
+        venue_id = rng.choice(venue_ids)
+        slot = rng.randrange(slots)
+        taken = booked.setdefault(venue_id, bytearray(slots // 8 + 1))
+        if taken[slot // 8] >> slot % 8 & 1:
+            continue
+        taken[slot // 8] |= 1 << slot % 8
+        count -= 1
+        day, hour = divmod(slot, len(SHOW_HOURS))
+        yield {
+            'venue_id': venue_id,
+            'artist_id': rng.choice(artist_ids),
+            'start_time': (now + timedelta(days=SHOW_DAYS[day])).replace(
+                hour=SHOW_HOURS[hour], minute=0, second=0, microsecond=0),
+        }
+
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed_database(venues, artists, shows, seed=0, now=None):
+    """Insert a deterministic synthetic catalogue and commit it.
+
+    The same arguments always produce the same rows, so benchmark runs
+    against freshly seeded databases are comparable.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+
+    insert_batches(Venue.__table__, venue_rows(rng, venues))
+    insert_batches(Artist.__table__, artist_rows(rng, artists))
+
+    venue_ids = [row.id for row in db.session.query(Venue.id).order_by(
+        Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id).order_by(
+        Artist.id)]
+    if shows and venue_ids and artist_ids:
+        insert_batches(Show.__table__,
+                       show_rows(rng, shows, venue_ids, artist_ids, now))
+
+    rebuild_venue_areas(db.session)
+    db.session.commit()
@@ -2,3 +2,51 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// "Load more" buttons on venue and artist pages append the next page of
+// show tiles rendered by /<venues|artists>/<id>/shows/<upcoming|past>.
+document.addEventListener('click', function (e) {
+  var button = e.target.closest('.load-more-shows');
+  if (!button) {
+    return;
+  }
+  var page = parseInt(button.dataset.page || '1', 10) + 1;
+  fetch(button.dataset.url + '?page=' + page)
+    .then(function (response) { return response.text(); })
+    .then(function (html) {
+      var target = document.getElementById(button.dataset.target);
+      target.insertAdjacentHTML('beforeend', html);
+      button.dataset.page = page;
+      if (!html.trim() || target.children.length >= parseInt(button.dataset.total, 10)) {
+        button.remove();
+      }
+    });
+});
+
+// Search boxes with data-autocomplete="<venues|artists>" suggest names
+// from /autocomplete in their <datalist> as the user types.
+document.addEventListener('input', function (e) {
+  var input = e.target.closest('[data-autocomplete]');
+  if (!input) {
+    return;
+  }
+  var kind = input.dataset.autocomplete;
+  var prefix = input.value;
+  clearTimeout(input.autocompleteTimer);
+  input.autocompleteTimer = setTimeout(function () {
+    fetch('/autocomplete?kind=' + kind + '&q=' + encodeURIComponent(prefix))
+      .then(function (response) { return response.json(); })
+      .then(function (results) {
+        if (input.value !== prefix) {
+          return;
+        }
+        var list = document.getElementById(input.getAttribute('list'));
+        list.innerHTML = '';
+        results[kind].forEach(function (result) {
+          var option = document.createElement('option');
+          option.value = result.name;
+          list.appendChild(option);
+        });
+      });
+  }, 100);
+});
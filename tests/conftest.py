@@ -0,0 +1,15 @@
+import pytest
+
+from app import app as fyyur_app
+
+
+@pytest.fixture
+def app():
+    # No test opens a database connection: the ones that need the app
+    # only use its config and request contexts. Config changes made by a
+    # test are undone after it.
+    config = dict(fyyur_app.config)
+    fyyur_app.config.update(TESTING=True)
+    yield fyyur_app
+    fyyur_app.config.clear()
+    fyyur_app.config.update(config)
@@ -0,0 +1,52 @@
+import base64
+import gzip
+import json
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from api import (COMPRESS_MIN_SIZE, api_response, decode_cursor,
+                 encode_cursor, parse_id_key)
+
+
+def test_matching_etag_answers_304(app):
+    data = {'data': [{'id': 1, 'name': 'The Musical Hop'}]}
+    with app.test_request_context():
+        first = api_response(data)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+
+    with app.test_request_context(headers={'If-None-Match': etag}):
+        second = api_response(data)
+    assert second.status_code == 304
+    assert second.get_data() == b''
+    assert second.headers['ETag'] == etag
+
+
+def test_changed_data_gets_a_new_etag(app):
+    with app.test_request_context():
+        etag = api_response({'data': [1]}).headers['ETag']
+    with app.test_request_context(headers={'If-None-Match': etag}):
+        response = api_response({'data': [2]})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_large_bodies_are_gzipped(app):
+    data = {'data': ['x' * COMPRESS_MIN_SIZE]}
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        response = api_response(data)
+    assert response.content_encoding == 'gzip'
+    assert json.loads(gzip.decompress(response.get_data())) == data
+
+
+def test_cursor_round_trip(app):
+    assert decode_cursor(encode_cursor(42), parse_id_key) == 42
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!', base64.urlsafe_b64encode(b'"42"').decode()])
+def test_invalid_cursor_is_a_bad_request(app, cursor):
+    with pytest.raises(BadRequest):
+        decode_cursor(cursor, parse_id_key)
@@ -0,0 +1,61 @@
+import pytest
+
+from autocomplete import NameIndex, name_key
+
+
+@pytest.fixture
+def index():
+    return NameIndex([(3, 'The Dueling Pianos Bar'), (1, 'The Musical Hop'),
+                      (4, 'Park Square Live Music & Coffee'),
+                      (2, 'the  musical hop')])
+
+
+def names(found):
+    return [entry['name'] for entry in found]
+
+
+def test_name_key_ignores_case_and_whitespace_runs():
+    assert name_key('  The\tMUSICAL   Hop ') == 'the musical hop'
+
+
+def test_completions_are_sorted_case_insensitively(index):
+    assert index.complete('the', 10) == [
+        {'id': 3, 'name': 'The Dueling Pianos Bar'},
+        {'id': 1, 'name': 'The Musical Hop'},
+        {'id': 2, 'name': 'the  musical hop'}]
+
+
+def test_prefix_is_normalized_like_the_names(index):
+    assert names(index.complete('  THE   mus', 10)) == [
+        'The Musical Hop', 'the  musical hop']
+
+
+def test_limit_and_misses(index):
+    assert len(index.complete('t', 2)) == 2
+    assert index.complete('zz', 10) == []
+    assert index.complete('   ', 10) == []
+
+
+def test_update_adds_renames_and_removes(index):
+    index.update(5, None, 'Parkside')
+    index.update(3, 'The Dueling Pianos Bar', 'Pianos')
+    index.update(1, 'The Musical Hop', None)
+
+    assert names(index.complete('p', 10)) == [
+        'Park Square Live Music & Coffee', 'Parkside', 'Pianos']
+    assert names(index.complete('the', 10)) == ['the  musical hop']
+    assert len(index) == 4
+
+
+def test_update_finds_entries_whose_old_name_is_out_of_date(index):
+    index.update(4, 'Renamed elsewhere', 'Square')
+    index.update(9, 'Never indexed', None)
+
+    assert names(index.complete('s', 10)) == ['Square']
+    assert index.complete('park', 10) == []
+    assert len(index) == 4
+
+
+def test_find_picks_the_entry_among_equal_names(index):
+    assert index.ids[index.find(2, 'THE MUSICAL HOP')] == 2
+    assert index.ids[index.find(1, 'the musical hop')] == 1
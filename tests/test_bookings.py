@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from werkzeug.datastructures import MultiDict
+
+import bookings
+import importer
+from bookings import VenueShows
+from forms import ShowForm
+from importer import ImportReport, TARGETS, validate_batch
+
+
+def at(hour, minute=0):
+    return datetime(2026, 10, 18, hour, minute)
+
+
+@pytest.fixture
+def shows():
+    # Added out of order: 18-20, 20-22 and 23-01.
+    return VenueShows([(2, at(20), at(22)), (1, at(18), at(20)),
+                       (3, at(23), at(23) + timedelta(hours=2))])
+
+
+def test_overlapping_shows_are_returned_by_start(shows):
+    assert shows.overlapping(at(19), at(21)) == [
+        (1, at(18), at(20)), (2, at(20), at(22))]
+
+
+def test_touching_periods_do_not_overlap(shows):
+    assert shows.overlapping(at(22), at(23)) == []
+    assert shows.overlapping(at(16), at(18)) == []
+
+
+def test_a_long_earlier_show_is_found_past_shorter_ones():
+    shows = VenueShows([(1, at(8), at(23)), (2, at(10), at(11)),
+                        (3, at(12), at(13))])
+    assert [show[0] for show in shows.overlapping(at(14), at(15))] == [1]
+    assert [show[0] for show in shows.overlapping(at(12), at(12, 30))] == \
+        [1, 3]
+
+
+def test_add_and_remove_keep_the_index_current(shows):
+    shows.add(4, at(22), at(23))
+    assert shows.overlapping(at(22, 30), at(22, 45)) == [(4, at(22), at(23))]
+    shows.remove(2)
+    shows.remove(99)
+    assert shows.overlapping(at(19), at(21)) == [(1, at(18), at(20))]
+    assert shows.max_ends == [at(20), at(23), at(23) + timedelta(hours=2)]
+
+
+def test_empty_periods_never_overlap(shows):
+    shows.add(5, at(21), at(21))
+    assert shows.overlapping(at(21), at(21, 30)) == [(2, at(20), at(22))]
+    assert shows.overlapping(at(21), at(21)) == []
+    assert VenueShows().overlapping(at(0), at(23)) == []
+
+
+@pytest.mark.parametrize('venue_id', ['', 'abc', '-1'])
+def test_show_form_rejects_missing_and_invalid_venue_ids(app, venue_id):
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.test_request_context():
+        form = ShowForm(MultiDict({'artist_id': '1', 'venue_id': venue_id,
+                                   'start_time': '2026-10-18 20:00:00'}))
+        assert not form.validate()
+        assert 'venue_id' in form.errors
+
+
+def test_imported_shows_overlapping_earlier_lines_are_rejected(
+        app, monkeypatch):
+    def check_show_references(batch, columns, errors):
+        for name in ('venue_id', 'artist_id'):
+            columns[name] = [int(value) for value in columns[name]]
+
+    monkeypatch.setattr(importer, 'check_show_references',
+                        check_show_references)
+    probed = []
+
+    def booked_overlaps(periods):
+        probed.extend(periods)
+        return {6: 17}
+
+    monkeypatch.setattr(importer, 'booked_overlaps', booked_overlaps)
+    batch = [(2, {'venue_id': 1, 'artist_id': 1,
+                  'start_time': '2026-10-18 20:00:00'}),
+             (3, {'venue_id': 1, 'artist_id': 2,
+                  'start_time': '2026-10-18 21:00:00',
+                  'duration_minutes': '30'}),
+             (4, {'venue_id': 2, 'artist_id': 2,
+                  'start_time': '2026-10-18 21:00:00'}),
+             (5, {'venue_id': 1, 'artist_id': 3,
+                  'start_time': '2026-10-18 22:00:00'}),
+             (6, {'venue_id': 3, 'artist_id': 3,
+                  'start_time': '2026-10-18 20:00:00'})]
+    report = ImportReport()
+
+    with app.app_context():
+        rows = validate_batch(TARGETS['shows'](), batch, report)
+
+    assert [row['artist_id'] for row in rows] == [1, 2, 3]
+    assert report.errors == [
+        (3, 'start_time', 'The venue is already booked then (line 2).'),
+        (6, 'start_time', 'The venue is already booked then (show 17).')]
+    assert [period[:2] for period in probed] == [(2, 1), (3, 1), (4, 2),
+                                                 (5, 1), (6, 3)]
+
+
+def test_booked_shows_are_loaded_around_each_venues_own_periods(
+        monkeypatch):
+    windows = {}
+
+    def load_venue_shows(venue_id, start, end):
+        windows[venue_id] = (start, end)
+        return VenueShows([(10 + venue_id, at(19), at(21))])
+
+    monkeypatch.setattr(bookings, 'load_venue_shows', load_venue_shows)
+    found = bookings.search_booked_overlaps([
+        (2, 1, at(8), at(9)), (3, 2, at(20), at(22)), (4, 1, at(20), at(23))])
+
+    assert windows == {1: (at(8), at(23)), 2: (at(20), at(22))}
+    assert found == {3: 12, 4: 11}
+
+
+def test_booked_shows_are_probed_by_the_exclusion_constraint(
+        app, monkeypatch):
+    statements = []
+
+    def execute(statement):
+        statements.append(statement)
+        return SimpleNamespace(all=lambda: [(3, 12)])
+
+    monkeypatch.setattr(bookings.db.session, 'execute', execute)
+    with app.app_context():
+        found = bookings.booked_overlaps([(3, 2, at(20), at(22))])
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert found == {3: 12}
+    assert 'FROM (VALUES' in sql
+    assert 'tsrange(wanted.start_time, wanted.end_time)' in sql
+    assert '&&' in sql
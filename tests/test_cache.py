@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pytest
+from flask import Response, g
+from werkzeug.exceptions import NotFound
+
+import app as app_module
+import cache as cache_module
+from cache import Cache, MemoryBackend, cached_page, conditional_page
+
+VERSION = datetime(2026, 10, 18, 20, 0)
+versions = {1: (VERSION, 'token')}
+
+
+@conditional_page(versions.get)
+def page(entity_id):
+    return f'page of {entity_id} at {g.page_version}'
+
+
+def test_first_request_builds_the_page(app):
+    with app.test_request_context('/venues/1'):
+        response = page(1)
+
+    etag, weak = response.get_etag()
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == f'page of 1 at {etag}'
+    assert response.headers['Last-Modified'] == \
+        'Sun, 18 Oct 2026 20:00:00 GMT'
+    assert weak
+
+
+def test_current_etag_gets_a_304_without_building_the_page(app):
+    with app.test_request_context('/venues/1'):
+        etag, _ = page(1).get_etag()
+    headers = {'If-None-Match': f'W/"{etag}"'}
+
+    with app.test_request_context('/venues/1', headers=headers):
+        response = page(1)
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.get_etag() == (etag, True)
+
+
+def test_changed_version_builds_the_page_again(app, monkeypatch):
+    with app.test_request_context('/venues/1'):
+        etag, _ = page(1).get_etag()
+    monkeypatch.setitem(app.config, 'RELEASE', 'next')
+
+    with app.test_request_context(
+            '/venues/1', headers={'If-None-Match': f'W/"{etag}"'}):
+        assert page(1).status_code == 200
+
+
+def test_changed_token_builds_the_page_again(app, monkeypatch):
+    # A transaction that committed late moved no timestamp.
+    with app.test_request_context('/venues/1'):
+        etag, _ = page(1).get_etag()
+    monkeypatch.setitem(versions, 1, (VERSION, 'later commit'))
+
+    with app.test_request_context(
+            '/venues/1', headers={'If-None-Match': f'W/"{etag}"'}):
+        assert page(1).status_code == 200
+
+
+def test_missing_entity_is_a_404(app):
+    with app.test_request_context('/venues/2'), pytest.raises(NotFound):
+        page(2)
+
+
+def test_page_payloads_are_cached_per_version(app, monkeypatch):
+    keys = []
+
+    def remember(key, build, tags=(), ttl=None):
+        keys.append(key)
+        raise LookupError
+
+    monkeypatch.setattr(app_module.cache, 'remember', remember)
+    views = [(app.view_functions['show_venue'], 'venue_id'),
+             (app.view_functions['show_artist'], 'artist_id')]
+    with app.test_request_context('/'):
+        g.page_version = 'etag'
+        for view, argument in views:
+            with pytest.raises(LookupError):
+                view.__wrapped__(**{argument: 3})
+
+    assert keys == ['venue-page:3:etag', 'artist-page:3:etag']
+
+
+@pytest.fixture
+def memory_cache():
+    cache = Cache()
+    cache.backend = MemoryBackend()
+    return cache
+
+
+def test_values_built_before_an_invalidation_are_not_served(memory_cache):
+    def build():
+        # A write to the venue commits after the value was read.
+        memory_cache.invalidate('venue:1')
+        return 'old'
+
+    assert memory_cache.remember('venue', build, tags={'venue:1'}) == 'old'
+    assert memory_cache.remember('venue', lambda: 'new',
+                                 tags={'venue:1'}) == 'new'
+    assert memory_cache.remember('venue', lambda: 'newer',
+                                 tags={'venue:1'}) == 'new'
+
+
+def test_values_with_tags_from_the_value_are_not_stored_after_a_write(
+        memory_cache):
+    def build():
+        memory_cache.invalidate('artist:2')
+        return {'artist_id': 2}
+
+    def tags(value):
+        return {f'artist:{value["artist_id"]}'}
+
+    memory_cache.remember('page', build, tags=tags)
+    assert memory_cache.get('page') is None
+    memory_cache.remember('page', lambda: {'artist_id': 2}, tags=tags)
+    assert memory_cache.get('page') == {'artist_id': 2}
+
+
+def test_streamed_pages_keep_the_versions_read_before_rendering(
+        app, memory_cache, monkeypatch):
+    monkeypatch.setattr(cache_module, 'cache', memory_cache)
+
+    @cached_page('shows')
+    def shows():
+        def stream():
+            yield 'first '
+            memory_cache.invalidate('shows')
+            yield 'second'
+        return Response(stream())
+
+    with app.test_request_context('/shows'):
+        assert ''.join(shows().response) == 'first second'
+    assert memory_cache.get('page:/shows?') is None
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+import importer
+from forms import ArtistForm, ShowForm, VenueForm
+from importer import ImportTarget, copy_value, form_values, import_records
+from models import Venue
+
+VENUE = {
+    'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+    'address': '1015 Folsom Street', 'phone': '1231231234',
+    'image_link': 'https://example.com/hop.png', 'genres': 'Jazz;Reggae',
+    'seeking_talent': 'yes',
+}
+
+
+def field(form_class, name):
+    return ImportTarget(Venue, form_class, None).fields[name]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Jazz, Reggae', ('Jazz', 'Reggae')),
+    ('{Jazz;Swing}', ('Jazz', 'Swing')),
+    (['Jazz', ' ', 'Folk '], ('Jazz', 'Folk')),
+    (None, ()),
+])
+def test_form_values_of_multiple_choice_cells(value, expected):
+    assert form_values(field(VenueForm, 'genres'), value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('yes', ('y',)), ('True', ('y',)), ('no', ()), ('0', ()), (' ', ()),
+    (True, ('y',)), (False, ()),
+])
+def test_form_values_of_boolean_cells(value, expected):
+    assert form_values(field(ArtistForm, 'seeking_venue'), value) == expected
+
+
+def test_form_values_of_iso_datetimes():
+    assert form_values(field(ShowForm, 'start_time'),
+                       ' 2026-10-18T20:00:00 ') == ('2026-10-18 20:00:00',)
+
+
+def test_form_values_of_plain_cells():
+    assert form_values(field(VenueForm, 'phone'), 5550100) == ('5550100',)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, '\\N'),
+    (True, 't'),
+    (False, 'f'),
+    (datetime(2026, 10, 18, 20, 0), '2026-10-18 20:00:00'),
+    (['Jazz', 'R"B', 'a\\b'], '{"Jazz","R\\\\"B","a\\\\\\\\b"}'),
+    ('tab\there\nnew\\line', 'tab\\there\\nnew\\\\line'),
+    (42, '42'),
+])
+def test_copy_value_escapes_for_copy_text_format(value, expected):
+    assert copy_value(value) == expected
+
+
+def test_checkpoint_removed_after_complete_import(app, tmp_path):
+    checkpoint = tmp_path / 'venues.csv.checkpoint'
+    checkpoint.write_text('{"line": 1}')
+    records = [(2, dict(VENUE, name='')), (3, dict(VENUE, phone='x'))]
+
+    with app.app_context():
+        report = import_records('venues', records, method='executemany',
+                                checkpoint=str(checkpoint))
+
+    assert report.rejected == 2
+    assert not checkpoint.exists()
+
+
+def test_sqlalchemy_errors_without_orig_fail_the_batch(app, tmp_path,
+                                                        monkeypatch):
+    def fail(table, rows):
+        raise InvalidRequestError('This session is in a bad state')
+
+    monkeypatch.setattr(importer, 'insert_rows', fail)
+    checkpoint = tmp_path / 'venues.csv.checkpoint'
+
+    with app.app_context():
+        report = import_records('venues', [(2, VENUE)], method='executemany',
+                                checkpoint=str(checkpoint))
+
+    assert report.inserted == 0
+    assert report.failed == {'first_line': 2, 'last_line': 2,
+                             'message': 'This session is in a bad state'}
@@ -0,0 +1,39 @@
+import pytest
+from flask import g
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from instrumentation import Metrics, RequestStats
+
+
+def test_histogram_family_is_typed_and_grouped():
+    metrics = Metrics()
+    metrics.inc('fyyur_requests_total', (('endpoint', 'index'),))
+    metrics.observe('fyyur_request_duration_seconds',
+                    (('endpoint', 'index'),), 0.02)
+
+    lines = metrics.render().splitlines()
+
+    start = lines.index('# TYPE fyyur_request_duration_seconds histogram')
+    family = lines[start + 1:start + 14]
+    assert [line.split('{')[0] for line in family] == (
+        ['fyyur_request_duration_seconds_bucket'] * 11
+        + ['fyyur_request_duration_seconds_count',
+           'fyyur_request_duration_seconds_sum'])
+    assert 'fyyur_request_duration_seconds_bucket{endpoint="index",' \
+           'le="0.025"} 1' in family
+    assert '# TYPE fyyur_requests_total counter' in lines
+
+
+def test_failed_statement_does_not_skew_later_timings(app):
+    # The listeners are registered on every Engine by init_app.
+    engine = create_engine('sqlite://')
+    with app.test_request_context(), engine.connect() as connection:
+        g.request_stats = stats = RequestStats()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing'))
+        connection.execute(text('SELECT 1'))
+
+        assert stats.sql_count == 1
+        assert 'query_started' not in connection.info
+        assert 0 <= stats.sql_time < 1
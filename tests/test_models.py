@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import inspect
+
+from models import UnplannedLazyLoadError, Venue, guard_lazy_loads
+
+
+def execution(is_select=True, lazy_loaded_from=None):
+    return SimpleNamespace(is_select=is_select,
+                           lazy_loaded_from=lazy_loaded_from)
+
+
+def test_unplanned_lazy_load_raises(app):
+    app.config['SQLALCHEMY_RAISE_ON_LAZY_LOAD'] = True
+    state = inspect(Venue(id=7))
+    with app.app_context():
+        with pytest.raises(UnplannedLazyLoadError, match='Venue'):
+            guard_lazy_loads(execution(lazy_loaded_from=state))
+
+
+def test_lazy_loads_allowed_unless_configured(app):
+    app.config['SQLALCHEMY_RAISE_ON_LAZY_LOAD'] = False
+    with app.app_context():
+        guard_lazy_loads(execution(lazy_loaded_from=inspect(Venue(id=7))))
+
+
+def test_planned_loads_and_writes_pass(app):
+    app.config['SQLALCHEMY_RAISE_ON_LAZY_LOAD'] = True
+    state = inspect(Venue(id=7))
+    with app.app_context():
+        guard_lazy_loads(execution())
+        # e.g. an executemany INSERT, which has no lazy_loaded_from
+        guard_lazy_loads(execution(is_select=False, lazy_loaded_from=state))
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+from flask import Flask
+from sqlalchemy import insert, select
+
+import routing
+from routing import RoutingSQLAlchemy
+from models import db, Venue
+
+
+@pytest.fixture
+def session(app, monkeypatch):
+    # Engines are created without connecting, so the replica need not exist.
+    app.config.update(
+        SQLALCHEMY_BINDS={
+            'replica_0': 'postgresql://postgres@replica:5432/fyyur'},
+        DB_REPLICA_BINDS=('replica_0',))
+    monkeypatch.setattr(routing.replica_health, 'healthy_binds',
+                        lambda db, app: ('replica_0',))
+    with app.app_context():
+        session = db.create_session({})()
+        yield session
+        session.close()
+
+
+def replica(app):
+    return db.get_engine(app, bind='replica_0')
+
+
+def test_reads_of_get_requests_use_a_replica(app, session):
+    with app.test_request_context('/venues'):
+        assert session.get_bind(clause=select(Venue)) is replica(app)
+        assert 'wrote' not in session.info
+
+
+def test_reads_of_other_requests_use_the_primary_without_sticking(app,
+                                                                  session):
+    with app.test_request_context('/venues/create', method='POST'):
+        assert session.get_bind(clause=select(Venue)) is db.get_engine(app)
+        assert 'wrote' not in session.info
+
+
+def test_writes_keep_the_rest_of_the_request_on_the_primary(app, session):
+    with app.test_request_context('/venues'):
+        session.get_bind(clause=insert(Venue))
+        assert session.info['wrote']
+        assert session.get_bind(clause=select(Venue)) is db.get_engine(app)
+
+
+def test_locking_reads_are_writes(app, session):
+    with app.test_request_context('/venues'):
+        session.get_bind(clause=select(Venue).with_for_update())
+        assert session.info['wrote']
+
+
+def test_replicas_need_a_lag_tolerance_covering_their_max_lag(app):
+    other = Flask(__name__)
+    other.config.update(app.config, DB_REPLICA_BINDS=('replica_0',),
+                        DB_REPLICA_MAX_LAG=30, DB_REPLICA_LAG_TOLERANCE=5)
+    with pytest.raises(ValueError):
+        RoutingSQLAlchemy().init_app(other)
+    other.config['DB_REPLICA_LAG_TOLERANCE'] = 30
+    RoutingSQLAlchemy().init_app(other)
+
+
+
+def test_replica_checks_do_not_block_requests(app):
+    health = routing.ReplicaHealth()
+    lag_checked = threading.Event()
+    release = threading.Event()
+
+    def lag(app, engine):
+        lag_checked.set()
+        release.wait(5)
+        return 1.0
+
+    health.probe = lambda db, app, bind: None
+    health.lag = lag
+    app.config.update(DB_REPLICA_BINDS=('replica_0',),
+                      DB_REPLICA_CHECK_INTERVAL=60)
+
+    assert health.healthy_binds(db, app) == ()
+    checking = health.checking
+    assert lag_checked.wait(5)
+    # A check is running: requests get the last result at once.
+    assert health.healthy_binds(db, app) == ()
+    assert health.checking is checking
+    release.set()
+    checking.join(5)
+    assert health.healthy_binds(db, app) == ('replica_0',)
+    assert health.checking is None
+
+
+def test_replica_probes_time_out(app, monkeypatch):
+    created = []
+    monkeypatch.setattr(routing, 'create_engine',
+                        lambda url, **options: created.append(options))
+    app.config.update(
+        SQLALCHEMY_BINDS={
+            'replica_0': 'postgresql://postgres@replica:5432/fyyur'},
+        DB_REPLICA_CHECK_TIMEOUT=2)
+
+    routing.ReplicaHealth().probe(db, app, 'replica_0')
+
+    assert created[0]['connect_args'] == {
+        'connect_timeout': 2, 'options': '-c statement_timeout=2000'}
@@ -0,0 +1,19 @@
+import pytest
+
+from search import build_tsquery
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('jazz', 'jazz:*'),
+    ('Jazz  SA', 'jazz:* & sa:*'),
+    ("guns n' roses!", 'guns:* & n:* & roses:*'),
+    ('café_bar', 'café:* & bar:*'),
+])
+def test_every_word_becomes_a_prefix_match(term, expected):
+    assert build_tsquery(term) == expected
+
+
+@pytest.mark.parametrize('term', ['', '   ', '!&|:*()', '___'])
+def test_terms_without_words_match_everything(term):
+    # tsquery operators in the input never reach to_tsquery.
+    assert build_tsquery(term) is None
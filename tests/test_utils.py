@@ -0,0 +1,21 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from utils import decode_show_cursor, encode_show_cursor
+
+
+def test_show_cursor_round_trip():
+    row = SimpleNamespace(start_time=datetime(2026, 10, 18, 21, 30, 5, 120),
+                          id=42)
+    cursor = encode_show_cursor(row)
+    assert decode_show_cursor(cursor) == (row.start_time, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', 'nonsense', '2026-10-18_x',
+                                    'yesterday_12'])
+def test_invalid_show_cursor_raises_value_error(cursor):
+    # /shows answers these with 400.
+    with pytest.raises(ValueError):
+        decode_show_cursor(cursor)
@@ -1,61 +1,286 @@
 from datetime import datetime
+from itertools import groupby
 
+from sqlalchemy import delete, func, select, tuple_
 
-def get_venue_page_payload(venue):
-    past_shows = []
-    upcoming_shows = []
+from areas import mark_areas_stale
+from async_db import async_db
+from autocomplete import mark_names_changed
+from cache import mark_stale
+from constants import SHOWS_PAGE_SIZE
+from models import db, Venue, Artist, Show, venue_areas
 
-    for show in venue.shows:
-        if show.start_time <= datetime.now():
-            past_shows.append(show.format())
-        else:
-            upcoming_shows.append(show.format())
 
+def get_venue_areas_payload(filters=()):
+    if filters:
+        return get_filtered_venue_areas_payload(filters)
+
+    rows = db.session.execute(select(venue_areas).order_by(
+        venue_areas.c.state, venue_areas.c.city))
+
+    return [{
+        'city': row.city,
+        'state': row.state,
+        'venues': row.venues
+    } for row in rows]
+
+
+def get_filtered_venue_areas_payload(filters):
+    # The area table holds every venue, so filtered directories are
+    # grouped from the venues table instead.
+    rows = db.session.query(
+        Venue.state,
+        Venue.city,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(*filters).order_by(
+        Venue.state, Venue.city, Venue.name, Venue.id
+    ).all()
+
+    return [{
+        'city': city,
+        'state': state,
+        'venues': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in area_rows]
+    } for (state, city), area_rows in groupby(
+        rows, key=lambda row: (row.state, row.city))]
+
+
+def get_show_tiles_query():
+    return db.session.query(
+        Show.id,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    )
+
+
+def format_show_row(row):
+    return row._asdict()
+
+
+def get_shows_page_query(owner_column, owner_id, upcoming, page=1,
+                         now=None):
+    now = now or datetime.now()
+    query = get_show_tiles_query().filter(owner_column == owner_id)
+
+    if upcoming:
+        query = query.filter(Show.start_time > now).order_by(
+            Show.start_time, Show.id)
+    else:
+        query = query.filter(Show.start_time <= now).order_by(
+            Show.start_time.desc(), Show.id.desc())
+
+    return query.limit(SHOWS_PAGE_SIZE).offset(
+        (page - 1) * SHOWS_PAGE_SIZE)
+
+
+def get_shows_page(owner_column, owner_id, upcoming, page=1, now=None):
+    rows = get_shows_page_query(owner_column, owner_id, upcoming, page,
+                                now).all()
+
+    return [format_show_row(row) for row in rows]
+
+
+class ShowsPage:
+    """Keyset page of show tiles ordered by (start_time, id).
+
+    Rows are fetched lazily while the template iterates, so a streamed
+    response can start before the query has run. ``next_cursor`` is
+    known once iteration has finished.
+    """
+
+    def __init__(self, after=None, limit=SHOWS_PAGE_SIZE):
+        self.limit = limit
+        self.next_cursor = None
+        self.query = get_show_tiles_query().order_by(
+            Show.start_time, Show.id)
+        if after is not None:
+            self.query = self.query.filter(
+                tuple_(Show.start_time, Show.id) > after)
+
+    def __iter__(self):
+        last = None
+        for index, row in enumerate(self.query.limit(self.limit + 1)):
+            if index == self.limit:
+                self.next_cursor = encode_show_cursor(last)
+                break
+            last = row
+            yield format_show_row(row)
+
+
+def encode_show_cursor(row):
+    return f'{row.start_time.isoformat()}_{row.id}'
+
+
+def decode_show_cursor(cursor):
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def count_shows_query(owner_column, owner_id, now):
+    return db.session.query(
+        func.count(Show.id).filter(Show.start_time > now),
+        func.count(Show.id).filter(Show.start_time <= now)
+    ).filter(owner_column == owner_id)
+
+
+VENUE_PAGE_FIELDS = (
+    'id', 'name', 'genres', 'city', 'state', 'address', 'phone',
+    'image_link', 'website_link', 'facebook_link', 'seeking_talent',
+    'seeking_description')
+ARTIST_PAGE_FIELDS = (
+    'id', 'name', 'genres', 'city', 'state', 'phone', 'image_link',
+    'website_link', 'facebook_link', 'seeking_venue', 'seeking_description')
+
+
+def get_page_queries(model, fields, owner_column, owner_id):
+    now = datetime.now()
     return {
-        'id': venue.id,
-        'name': venue.name,
-        'genres': venue.genres,
-        'city': venue.city,
-        'state': venue.state,
-        'address': venue.address,
-        'phone': venue.phone,
-        'image_link': venue.image_link,
-        'website_link': venue.website_link,
-        'facebook_link': venue.facebook_link,
-        'seeking_talent': venue.seeking_talent,
-        'seeking_description': venue.seeking_description,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows),
+        'entity': db.session.query(
+            *[getattr(model, field) for field in fields]
+        ).filter(model.id == owner_id),
+        'counts': count_shows_query(owner_column, owner_id, now),
+        'past_shows': get_shows_page_query(owner_column, owner_id,
+                                           upcoming=False, now=now),
+        'upcoming_shows': get_shows_page_query(owner_column, owner_id,
+                                               upcoming=True, now=now),
     }
 
 
-def get_artist_page_payload(artist):
-    past_shows = []
-    upcoming_shows = []
+def run_page_queries(queries):
+    # The queries are independent, so the async engine can run them at
+    # the same time on separate connections.
+    if async_db.enabled:
+        return async_db.run_all({
+            name: query.statement for name, query in queries.items()})
+    return {name: query.all() for name, query in queries.items()}
 
-    for show in artist.shows:
-        if show.start_time <= datetime.now():
-            past_shows.append(show.format())
-        else:
-            upcoming_shows.append(show.format())
 
+def get_page_payload(model, fields, owner_column, owner_id):
+    results = run_page_queries(
+        get_page_queries(model, fields, owner_column, owner_id))
+    if not results['entity']:
+        return None
+    upcoming_shows_count, past_shows_count = results['counts'][0]
 
     return {
-        'id': artist.id,
-        'name': artist.name,
-        'genres': artist.genres,
-        'city': artist.city,
-        'state': artist.state,
-        'phone': artist.phone,
-        'image_link': artist.image_link,
-        'website_link': artist.website_link,
-        'facebook_link': artist.facebook_link,
-        'seeking_venue': artist.seeking_venue,
-        'seeking_description': artist.seeking_description,
-        "past_shows": past_shows,
-        "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows),
+        **dict(zip(fields, results['entity'][0])),
+        "past_shows": [format_show_row(row)
+                       for row in results['past_shows']],
+        "upcoming_shows": [format_show_row(row)
+                           for row in results['upcoming_shows']],
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count,
     }
+
+
+def get_page_version(model, owner_column, other_model, other_column,
+                     owner_id):
+    """The version of an entity's page, or None if it is missing.
+
+    Returns when the page last changed and a token that changes with it.
+    Covers the entity, its shows and the other side of those shows, and
+    the start of its latest show that has begun, since that moves from
+    the upcoming to the past list without any row changing.
+
+    Rows are stamped when they are written, not when they commit, so the
+    latest stamp can stay put when a long transaction commits after a
+    shorter one. The token also sums the row versions and counts the
+    shows, which every update, insert and delete changes.
+    """
+    now = datetime.now()
+    row = db.session.query(
+        model.updated_at,
+        func.max(Show.updated_at),
+        func.max(other_model.updated_at),
+        func.max(Show.start_time).filter(Show.start_time <= now),
+        model.row_version,
+        func.count(Show.id),
+        func.coalesce(func.sum(Show.row_version), 0),
+        func.coalesce(func.sum(other_model.row_version), 0)
+    ).select_from(model).outerjoin(
+        Show, owner_column == model.id
+    ).outerjoin(
+        other_model, other_model.id == other_column
+    ).filter(model.id == owner_id).group_by(model.id).first()
+
+    if row is None:
+        return None
+    last_modified = max(filter(None, row[:4]))
+    return last_modified, ':'.join(
+        str(value) for value in (last_modified.isoformat(), *row[4:]))
+
+
+def get_venue_page_version(venue_id):
+    return get_page_version(Venue, Show.venue_id, Artist, Show.artist_id,
+                            venue_id)
+
+
+def get_venue_page_payload(venue_id):
+    return get_page_payload(Venue, VENUE_PAGE_FIELDS, Show.venue_id,
+                            venue_id)
+
+
+def get_venue_page_tags(payload):
+    return {f'venue:{payload["id"]}'} | {
+        f'artist:{show["artist_id"]}'
+        for show in payload['upcoming_shows'] + payload['past_shows']}
+
+
+def get_artist_page_version(artist_id):
+    return get_page_version(Artist, Show.artist_id, Venue, Show.venue_id,
+                            artist_id)
+
+
+def get_artist_page_payload(artist_id):
+    return get_page_payload(Artist, ARTIST_PAGE_FIELDS, Show.artist_id,
+                            artist_id)
+
+
+def get_artist_page_tags(payload):
+    return {f'artist:{payload["id"]}'} | {
+        f'venue:{show["venue_id"]}'
+        for show in payload['upcoming_shows'] + payload['past_shows']}
+
+
+def delete_entities(model, ids):
+    """Delete venues or artists by id in one statement, without committing.
+
+    Their shows are removed by the ON DELETE CASCADE foreign keys and
+    never loaded. Returns the deleted rows as (id, name).
+    """
+    table = model.__table__
+    if model is Artist:
+        # Deleting an artist's shows changes the upcoming counts shown in
+        # the /venues directory for the venues they were at.
+        mark_areas_stale(db.session, venue_ids=db.session.execute(
+            select(Show.venue_id).where(
+                Show.artist_id.in_(ids)).distinct()).scalars())
+
+    rows = db.session.execute(delete(table).where(
+        table.c.id.in_(ids)
+    ).returning(table.c.id, table.c.name, table.c.state,
+                table.c.city)).all()
+
+    kind = 'venue' if model is Venue else 'artist'
+    mark_stale(db.session, 'venues', 'artists', 'shows',
+               *[f'{kind}:{row.id}' for row in rows])
+    if model is Venue:
+        mark_areas_stale(db.session,
+                         areas={(row.state, row.city) for row in rows})
+    mark_names_changed(db.session, model.__tablename__,
+                       [(row.id, row.name, None) for row in rows])
+    return [(row.id, row.name) for row in rows]